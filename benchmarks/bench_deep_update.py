@@ -0,0 +1,77 @@
+"""Benchmark deep_update on CVs with many list entries.
+
+Run from the repository root:
+    python -m benchmarks.bench_deep_update
+"""
+
+import copy
+import time
+
+from src.data_utils import deep_update
+from src.schemas import CV_SCHEMA
+
+SIZES = [50, 100, 500, 1000, 2000]
+NEW_ENTRIES = 50
+REPEATS = 5
+
+
+def make_cv(entries):
+    """Build CV data with the given number of entries in every list."""
+    cv = copy.deepcopy(CV_SCHEMA)
+    cv["Utdanning"] = [
+        {"Grad": f"Grad {i}", "Trinn/Ferdig_år": str(2000 + i % 25), "Skole": f"Skole {i}", "Ytterligere_informasjon": ""}
+        for i in range(entries)
+    ]
+    cv["Arbeidserfaring"]["Stillinger"] = [
+        {"Tittel": f"Tittel {i}", "Firma": f"Firma {i}", "Periode": "2020-2022", "Beskrivelse": f"Beskrivelse {i}"}
+        for i in range(entries)
+    ]
+    cv["Ferdigheter"]["Sertifikater"] = [f"Sertifikat {i}" for i in range(entries)]
+    return cv
+
+
+def make_update(entries):
+    """Build an update where half the entries exist already and half are new."""
+    offset = entries - NEW_ENTRIES // 2
+    return {
+        "Utdanning": [
+            {"Grad": f"Grad {i}", "Skole": f"Skole {i}", "Ytterligere_informasjon": "Oppdatert"}
+            for i in range(offset, offset + NEW_ENTRIES)
+        ],
+        "Arbeidserfaring": {
+            "Stillinger": [
+                {"Tittel": f"Tittel {i}", "Firma": f"Firma {i}", "Periode": "2022-2024"}
+                for i in range(offset, offset + NEW_ENTRIES)
+            ],
+        },
+        "Ferdigheter": {"Sertifikater": [f"Sertifikat {i}" for i in range(offset, offset + NEW_ENTRIES)]},
+    }
+
+
+def bench(entries):
+    """Return the best time in milliseconds for merging one update."""
+    update = make_update(entries)
+    best = float("inf")
+    for _ in range(REPEATS):
+        cv = make_cv(entries)
+        start = time.perf_counter()
+        deep_update(cv, copy.deepcopy(update))
+        best = min(best, time.perf_counter() - start)
+
+    # Sanity check: existing entries are merged, new ones appended once
+    expected = entries + NEW_ENTRIES // 2
+    assert len(cv["Utdanning"]) == expected, len(cv["Utdanning"])
+    assert len(cv["Ferdigheter"]["Sertifikater"]) == expected
+    return best * 1000
+
+
+def main():
+    print(f"deep_update: merging {NEW_ENTRIES} entries per list (half new) into a CV")
+    print(f"{'entries/list':>12} {'ms':>10} {'us/entry':>10}")
+    for entries in SIZES:
+        ms = bench(entries)
+        print(f"{entries:>12} {ms:>10.3f} {ms * 1000 / entries:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark Word document build time and size for large CVs.
+
+Run from the repository root (requires python-docx):
+    python -m benchmarks.bench_docx
+"""
+
+import copy
+import time
+
+from src import cv_generator
+from src.cv_generator import build_word_docx, get_docx_base_template
+from src.schemas import CV_SCHEMA
+
+SIZES = [5, 50, 200, 500]
+REPEATS = 5
+
+
+def make_cv(entries):
+    """Build CV data with the given number of entries in every list."""
+    cv = copy.deepcopy(CV_SCHEMA)
+    cv["Personalia"].update(Navn="Ola Nordmann", Fødselsdato="01.01.2000", Epost="ola@example.com",
+                            Telefonnummer="+47 923 45 678", Adresse="Storgata 1, 0155 Oslo")
+    cv["Utdanning"] = [
+        {"Grad": f"Grad {i}", "Trinn/Ferdig_år": str(2000 + i % 25), "Skole": f"Skole {i}",
+         "Ytterligere_informasjon": f"Fordypning {i}"}
+        for i in range(entries)
+    ]
+    cv["Arbeidserfaring"]["Stillinger"] = [
+        {"Tittel": f"Tittel {i}", "Firma": f"Firma {i}", "Periode": "2020-2022",
+         "Beskrivelse": f"Ansvar for oppgave {i} og kundeservice"}
+        for i in range(entries)
+    ]
+    cv["Ferdigheter"]["Ferdigheter_og_kompetanser"] = [
+        {"Ferdighet": f"Ferdighet {i}", "Nivå": "Middels", "Beskrivelse": ""} for i in range(entries)
+    ]
+    cv["Ferdigheter"]["Sertifikater"] = [f"Sertifikat {i}" for i in range(entries)]
+    return cv
+
+
+def bench(entries):
+    """Return the best build time in milliseconds and the document size in KB."""
+    cv = make_cv(entries)
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        buffer = build_word_docx(cv)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, len(buffer.getvalue()) / 1024
+
+
+def main():
+    # First build includes creating the base template
+    cv_generator._docx_base["data"] = None
+    start = time.perf_counter()
+    get_docx_base_template()
+    print(f"base template: built in {(time.perf_counter() - start) * 1000:.1f} ms (once per process)")
+
+    print(f"{'entries/list':>12} {'ms':>10} {'KB':>10}")
+    for entries in SIZES:
+        ms, kb = bench(entries)
+        print(f"{entries:>12} {ms:>10.2f} {kb:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark pdflatex compile times with and without the precompiled preamble.
+
+Run from the repository root (requires pdflatex and the mylatexformat package):
+    python -m benchmarks.bench_latex_format
+"""
+
+import copy
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from src.cv_generator import build_preamble_format, render_latex_cv, run_pdflatex
+from src.schemas import CV_SCHEMA
+
+RUNS = 5
+
+
+def sample_cv():
+    """Build a typical filled-in CV."""
+    cv = copy.deepcopy(CV_SCHEMA)
+    cv["Personalia"].update(Navn="Ola Nordmann", Fødselsdato="01.01.2000", Epost="ola@example.com",
+                            Telefonnummer="+47 923 45 678", Adresse="Storgata 1, 0155 Oslo")
+    cv["Utdanning"] = [
+        {"Grad": "Bachelor i informatikk", "Trinn/Ferdig_år": "2022", "Skole": "NTNU", "Ytterligere_informasjon": "Fordypning i KI"},
+        {"Grad": "Studiespesialisering", "Trinn/Ferdig_år": "2019", "Skole": "Oslo katedralskole", "Ytterligere_informasjon": ""},
+    ]
+    cv["Arbeidserfaring"]["Stillinger"] = [
+        {"Tittel": "Butikkmedarbeider", "Firma": "Coop Extra", "Periode": "2019-2022", "Beskrivelse": "Kundeservice og kassearbeid"},
+    ]
+    cv["Ferdigheter"]["Språk"] = [{"Språk": "Norsk", "Nivå": "Morsmål"}, {"Språk": "Engelsk", "Nivå": "Flytende"}]
+    cv["Ferdigheter"]["Sertifikater"] = ["Førerkort klasse B"]
+    return cv
+
+
+def time_compiles(tex_path, output_dir, format_dir=None):
+    """Compile RUNS times and return the durations in seconds."""
+    durations = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        result = run_pdflatex(tex_path, output_dir, format_dir)
+        durations.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"pdflatex failed:\n{result.stdout.decode(errors='replace')[-2000:]}")
+    return durations
+
+
+def main():
+    if shutil.which("pdflatex") is None:
+        print("pdflatex not found, skipping benchmark")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tex_path = os.path.join(tmp, "CV.tex")
+        with open(tex_path, mode="w", encoding="utf-8") as f:
+            f.write(render_latex_cv(sample_cv()))
+
+        start = time.perf_counter()
+        format_dir = build_preamble_format(os.path.join(tmp, "formats"))
+        build_seconds = time.perf_counter() - start
+        if format_dir is None:
+            print("Could not build the preamble format (is mylatexformat installed?)")
+            return
+
+        cold = time_compiles(tex_path, tmp)
+        precompiled = time_compiles(tex_path, tmp, format_dir)
+
+    print(f"format build (once per process): {build_seconds:.3f} s")
+    print(f"{'mode':>12} {'mean s':>8} {'min s':>8}")
+    print(f"{'cold':>12} {statistics.mean(cold):>8.3f} {min(cold):>8.3f}")
+    print(f"{'precompiled':>12} {statistics.mean(precompiled):>8.3f} {min(precompiled):>8.3f}")
+    print(f"speedup: {statistics.mean(cold) / statistics.mean(precompiled):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
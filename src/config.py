@@ -10,6 +10,37 @@ HISTORY_LENGTH = 5
 SUMMARIZE_OLD_HISTORY = True
 MIN_TIME_BETWEEN_REQUESTS = datetime.timedelta(seconds=3)
 
+# JSON extraction mode: "structured" uses the API's JSON schema response format
+# (derived from src.schemas.CV_SCHEMA), "text" parses free-text JSON
+EXTRACTION_MODE = "structured"
+
+# JSON extraction output per turn: "patches" returns patch operations applied by
+# data_utils.apply_cv_patches, "object" returns a full CV object merged by deep_update
+EXTRACTION_FORMAT = "patches"
+
+# Prompt token budgets (estimated tokens, see src/prompt_budget.py)
+PROMPT_TOKEN_BUDGET = 8000
+PROMPT_SECTION_BUDGETS = {
+    "cv_data": 3000,
+    "user_message": 800,
+    "conversation_summary": 600,
+    "recent_messages": 2000,
+    "question": 1500,
+}
+
+# Suggestion cache (in-process, shared by all sessions)
+SUGGESTION_CACHE_SIZE = 512
+SUGGESTION_CACHE_TTL = 3600  # seconds
+SUGGESTION_VARIATION_POOL_SIZE = 4  # suggestion sets per "Regenerer forslag" LLM call
+
+# OpenAI HTTP connection pool (shared by all sessions in the process)
+OPENAI_MAX_CONNECTIONS = 20
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = 10
+OPENAI_KEEPALIVE_EXPIRY = 60.0  # seconds an idle connection is kept open
+OPENAI_CONNECT_TIMEOUT = 5.0  # seconds
+OPENAI_READ_TIMEOUT = 120.0  # seconds
+OPENAI_MAX_RETRIES = 2
+
 # UI Configuration
 GITHUB_URL = "https://github.com/streamlit/streamlit-assistant"
 
@@ -21,5 +52,67 @@ SUGGESTIONS = {
     ":red[:material/multiline_chart:] Foreslå jobbalternativer (kommer snart!)": "",
 }
 
+# Polish CV text with the LLM before rendering (the LaTeX itself is rendered locally)
+CV_POLISH_WITH_LLM = True
+
 # Output directory for generated files
 OUTPUT_DIR = "outputs"
+
+# Precompile the LaTeX preamble into a pdflatex format file once per process
+LATEX_USE_PRECOMPILED_PREAMBLE = True
+LATEX_FORMAT_DIR = "outputs/formats"
+
+# LaTeX compilation: one temporary build directory per job, bounded concurrency
+LATEX_BUILD_DIR = "outputs/builds"
+LATEX_BUILD_MAX_AGE = 3600  # seconds before leftover build directories are removed
+LATEX_MAX_CONCURRENT_COMPILES = 2
+LATEX_COMPILE_TIMEOUT = 30  # seconds per pdflatex pass before it is killed
+LATEX_MEMORY_LIMIT_MB = 1024  # address space limit for pdflatex (applied with prlimit, Linux only)
+LATEX_MAX_PASSES = 3  # passes are only repeated while cross-references change
+
+# PDF backend: "latex", "pymupdf" (no TeX needed) or "auto" (LaTeX, falling back
+# to PyMuPDF when pdflatex is missing, fails or the compile pool is busy)
+PDF_BACKEND = "auto"
+PDF_FALLBACK_QUEUE_DEPTH = 4  # compiles waiting for the pool before new CVs use PyMuPDF
+
+# Live HTML preview of the CV: cached sections and height in pixels
+PREVIEW_CACHE_SIZE = 256
+PREVIEW_HEIGHT = 600
+
+# PostHog event pipeline: queue capacity, batching, and sampling when the queue
+# is more than EVENT_SAMPLE_THRESHOLD full (keep EVENT_SAMPLE_RATE of routine events)
+EVENT_QUEUE_SIZE = 10000
+EVENT_BATCH_SIZE = 100
+EVENT_FLUSH_INTERVAL = 5.0  # seconds
+EVENT_SAMPLE_THRESHOLD = 0.8
+EVENT_SAMPLE_RATE = 0.1
+
+# Per-session metrics buffers keep only the most recent entries
+METRICS_MAX_EVENTS = 200
+METRICS_MAX_ERRORS = 50
+METRICS_MAX_RESPONSE_TIMES = 100
+METRICS_MAX_TURN_TRACES = 10
+
+# Tracing: spans of the most recent traces are kept in memory (all sessions).
+# Set TRACE_EXPORT_PATH to also append every finished span to a JSON Lines file
+TRACE_MAX_TRACES = 200
+TRACE_EXPORT_PATH = None
+
+# Session metrics: spooled locally in SQLite, uploaded in batches in the background.
+# METRICS_SINK is "supabase" (sessions table) or "local" (JSON Lines file, for testing)
+METRICS_SINK = "supabase"
+METRICS_SPOOL_PATH = "outputs/metrics_spool.db"
+METRICS_LOCAL_SINK_PATH = "outputs/metrics_sessions.jsonl"
+METRICS_UPLOAD_INTERVAL = 30  # seconds
+METRICS_UPLOAD_BATCH_SIZE = 100
+METRICS_UPLOAD_MAX_BACKOFF = 600  # seconds between retries of a failed upload
+
+# Background jobs (CV generation): worker threads and how long finished jobs are kept
+JOB_MAX_WORKERS = 4
+JOB_RETENTION = 600  # seconds
+
+# Cache of generated PDF/DOCX files, keyed by a hash of the CV data and template version
+CV_TEMPLATE_VERSION = 2  # bump when rendering changes outside cv_generator.py/templates.py
+CV_ARTIFACT_CACHE_SIZE = 32  # generated CVs kept in memory
+CV_ARTIFACT_CACHE_DIR = "outputs/artifacts"
+CV_ARTIFACT_DISK_CACHE_MAX_BYTES = 200 * 1024 * 1024
@@ -1,116 +1,1161 @@
 """CV generation functions (PDF/LaTeX and Word)."""
 
+import hashlib
+import html
+import json
 import os
+import re
+import shutil
+import struct
 import subprocess
+import tempfile
 import textwrap
+import threading
+import time
 import io
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
-from src.config import MODEL, OUTPUT_DIR
-from src.templates import LATEX_TEMPLATE
+import pymupdf
 
+from src.config import (
+    MODEL,
+    EXTRACTION_MODE,
+    CV_POLISH_WITH_LLM,
+    LATEX_FORMAT_DIR,
+    LATEX_USE_PRECOMPILED_PREAMBLE,
+    LATEX_BUILD_DIR,
+    LATEX_BUILD_MAX_AGE,
+    LATEX_MAX_CONCURRENT_COMPILES,
+    LATEX_COMPILE_TIMEOUT,
+    LATEX_MEMORY_LIMIT_MB,
+    LATEX_MAX_PASSES,
+    PDF_BACKEND,
+    PDF_FALLBACK_QUEUE_DEPTH,
+    PREVIEW_CACHE_SIZE,
+    CV_TEMPLATE_VERSION,
+    CV_ARTIFACT_CACHE_SIZE,
+    CV_ARTIFACT_CACHE_DIR,
+    CV_ARTIFACT_DISK_CACHE_MAX_BYTES,
+)
+from src.cache import LRUCache, DiskCache
+from src.data_utils import parse_cv_json
+from src.llm_client import executor
+from src.metrics import log_error, log_event, record_timing, record_token_usage, traced, current_span, submit_traced
+from src.schemas import CV_RESPONSE_FORMAT
+from src import templates as cv_templates
+from src.templates import (
+    LATEX_PREAMBLE,
+    LATEX_DOCUMENT,
+    LATEX_HEADER,
+    LATEX_CONTACT_ITEMS,
+    LATEX_CONTACT_SEPARATOR,
+    LATEX_SECTION,
+    LATEX_SUBSECTION,
+    LATEX_TWOCOL_ENTRY,
+    LATEX_ONECOL_ENTRY,
+    LATEX_HIGHLIGHTS,
+    LATEX_HIGHLIGHT_ITEM,
+    HTML_CSS,
+    HTML_DOCUMENT,
+    HTML_HEADER,
+    HTML_CONTACT_ITEMS,
+    HTML_CONTACT_SEPARATOR,
+    HTML_SECTION,
+    HTML_SUBSECTION,
+    HTML_TWOCOL_ENTRY,
+    HTML_ONECOL_ENTRY,
+    HTML_HIGHLIGHTS,
+    HTML_HIGHLIGHT_ITEM,
+)
+
+
+_LATEX_SPECIAL_CHARS = {
+    "\\": r"\textbackslash{}",
+    "&": r"\&",
+    "%": r"\%",
+    "$": r"\$",
+    "#": r"\#",
+    "_": r"\_",
+    "{": r"\{",
+    "}": r"\}",
+    "~": r"\textasciitilde{}",
+    "^": r"\textasciicircum{}",
+}
 
-def json_to_cv_pdf(client, cv_dict):
-    """Generates a CV PDF from the JSON data.
+
+def latex_escape(text):
+    """Escape text for use in a LaTeX document.
+
+    Args:
+        text: Plain text (non-strings are converted)
+
+    Returns:
+        str: Text with LaTeX special characters escaped
+    """
+    text = " ".join(str(text).split())
+    return "".join(_LATEX_SPECIAL_CHARS.get(ch, ch) for ch in text)
+
+
+def html_escape(text):
+    """Escape text for use in an HTML document.
+
+    Args:
+        text: Plain text (non-strings are converted)
+
+    Returns:
+        str: Text with HTML special characters escaped
+    """
+    return html.escape(" ".join(str(text).split()))
+
+
+# Markup used by the section renderers, so the same code renders LaTeX and HTML.
+#   bold: %-format string wrapping text in bold
+#   line_break: forced line break inside an entry
+#   subsection_separator: placed between the subsections of a section
+CVMarkup = namedtuple("CVMarkup", [
+    "escape", "bold", "line_break", "header", "contact_items", "contact_separator",
+    "section", "subsection", "subsection_separator",
+    "twocol_entry", "onecol_entry", "highlights", "highlight_item",
+])
+
+LATEX_MARKUP = CVMarkup(
+    escape=latex_escape,
+    bold=r"\textbf{%s}",
+    line_break=r" \\" + "\n    ",
+    header=LATEX_HEADER,
+    contact_items=LATEX_CONTACT_ITEMS,
+    contact_separator=LATEX_CONTACT_SEPARATOR,
+    section=LATEX_SECTION,
+    subsection=LATEX_SUBSECTION,
+    subsection_separator="\n\n\\vspace{0.3cm}\n\n",
+    twocol_entry=LATEX_TWOCOL_ENTRY,
+    onecol_entry=LATEX_ONECOL_ENTRY,
+    highlights=LATEX_HIGHLIGHTS,
+    highlight_item=LATEX_HIGHLIGHT_ITEM,
+)
+
+HTML_MARKUP = CVMarkup(
+    escape=html_escape,
+    bold="<b>%s</b>",
+    line_break="<br>",
+    header=HTML_HEADER,
+    contact_items=HTML_CONTACT_ITEMS,
+    contact_separator=HTML_CONTACT_SEPARATOR,
+    section=HTML_SECTION,
+    subsection=HTML_SUBSECTION,
+    subsection_separator="\n",
+    twocol_entry=HTML_TWOCOL_ENTRY,
+    onecol_entry=HTML_ONECOL_ENTRY,
+    highlights=HTML_HIGHLIGHTS,
+    highlight_item=HTML_HIGHLIGHT_ITEM,
+)
+
+
+def _filled(entries):
+    """Drop list entries without any filled-in value."""
+    return [
+        entry for entry in entries or []
+        if (any(str(v).strip() for v in entry.values()) if isinstance(entry, dict) else str(entry).strip())
+    ]
+
+
+def _field(entry, key, markup):
+    """Escaped field of an entry ("" if missing)."""
+    return markup.escape(entry.get(key) or "")
+
+
+def _bold_field(entry, key, markup):
+    """Escaped field in bold ("" if missing)."""
+    return markup.bold % _field(entry, key, markup) if entry.get(key) else ""
+
+
+def _highlights(items, markup):
+    """Render a highlights list, or "" if there are no items."""
+    items = [item for item in items if item]
+    if not items:
+        return ""
+    return markup.highlights.substitute(
+        items="\n".join(markup.highlight_item.substitute(text=item) for item in items)
+    )
+
+
+def _join(*parts, sep=" – "):
+    """Join the non-empty parts."""
+    return sep.join(part for part in parts if part)
+
+
+def _render_header(cv_dict, markup):
+    personalia = cv_dict.get("Personalia", {})
+    contact = [
+        icon + markup.escape(personalia[key])
+        for key, icon in markup.contact_items.items()
+        if str(personalia.get(key) or "").strip()
+    ]
+    return markup.header.substitute(
+        name=_field(personalia, "Navn", markup),
+        contact=markup.contact_separator.join(contact),
+    )
+
+
+def _render_education(cv_dict, markup):
+    entries = [
+        markup.twocol_entry.substitute(
+            right=_field(entry, "Trinn/Ferdig_år", markup),
+            left=_join(_bold_field(entry, "Grad", markup), _field(entry, "Skole", markup)),
+            highlights=_highlights([_field(entry, "Ytterligere_informasjon", markup)], markup),
+        )
+        for entry in _filled(cv_dict.get("Utdanning"))
+    ]
+    return "\n\n".join(entries)
+
+
+def _render_experience(cv_dict, markup):
+    arbeid = cv_dict.get("Arbeidserfaring", {})
+    stillinger = [
+        markup.twocol_entry.substitute(
+            right=_field(entry, "Periode", markup),
+            left=_join(_bold_field(entry, "Tittel", markup), _field(entry, "Firma", markup), sep=", "),
+            highlights=_highlights([_field(entry, "Beskrivelse", markup)], markup),
+        )
+        for entry in _filled(arbeid.get("Stillinger"))
+    ]
+    dugnad = [
+        markup.twocol_entry.substitute(
+            right=_field(entry, "Periode", markup),
+            left=markup.bold % _field(entry, "Oppdrag", markup),
+            highlights=_highlights([_field(entry, "Beskrivelse", markup)], markup),
+        )
+        for entry in _filled(arbeid.get("Dugnad"))
+    ]
+
+    subsections = []
+    if stillinger:
+        subsections.append(markup.subsection.substitute(title="Stillinger", content="\n\n".join(stillinger)))
+    if dugnad:
+        subsections.append(markup.subsection.substitute(title="Dugnad", content="\n\n".join(dugnad)))
+    return markup.subsection_separator.join(subsections)
+
+
+def _render_skills(cv_dict, markup):
+    ferdigheter = cv_dict.get("Ferdigheter", {})
+    blocks = []
+
+    skills = [
+        _join(
+            _field(entry, "Ferdighet", markup) + (f" ({_field(entry, 'Nivå', markup)})" if entry.get("Nivå") else ""),
+            _field(entry, "Beskrivelse", markup),
+            sep=": ",
+        )
+        for entry in _filled(ferdigheter.get("Ferdigheter_og_kompetanser"))
+    ]
+    if skills:
+        blocks.append(markup.bold % "Ferdigheter og kompetanser:" + _highlights(skills, markup))
+
+    languages = [
+        _field(entry, "Språk", markup) + (f" ({_field(entry, 'Nivå', markup)})" if entry.get("Nivå") else "")
+        for entry in _filled(ferdigheter.get("Språk"))
+    ]
+    if languages:
+        blocks.append(markup.bold % "Språk:" + " " + ", ".join(languages))
+
+    for key in ("Sertifikater", "Annet"):
+        items = [markup.escape(item) for item in _filled(ferdigheter.get(key))]
+        if items:
+            blocks.append(markup.bold % f"{key}:" + markup.line_break + ", ".join(items))
+
+    return "\n\n".join(markup.onecol_entry.substitute(content=block) for block in blocks)
+
+
+def _render_interests(cv_dict, markup):
+    return "\n\n".join(
+        markup.onecol_entry.substitute(
+            content=_join(_bold_field(entry, "Interesse/Hobby", markup), _field(entry, "Beskrivelse", markup))
+        )
+        for entry in _filled(cv_dict.get("Interesser_og_hobbyer"))
+    )
+
+
+def _render_goals(cv_dict, markup):
+    mål = cv_dict.get("Fremtidige_mål", {})
+    blocks = []
+    if str(mål.get("Fremtidsutsikter_og_mål") or "").strip():
+        blocks.append(markup.bold % "Fremtidsutsikter og mål:" + " " + _field(mål, "Fremtidsutsikter_og_mål", markup))
+
+    wishes = [
+        _join(_field(entry, "Jobbønske", markup), _field(entry, "Begrunnelse", markup))
+        for entry in _filled(mål.get("Jobbønsker"))
+    ]
+    if wishes:
+        blocks.append(markup.bold % "Jobbønsker:" + _highlights(wishes, markup))
+
+    return "\n\n".join(markup.onecol_entry.substitute(content=block) for block in blocks)
+
+
+# Parts of the CV in template order: (section title, CV_dict key it is rendered
+# from, renderer). The header has no title. Empty sections are left out.
+_CV_SECTIONS = [
+    (None, "Personalia", _render_header),
+    ("Utdanning", "Utdanning", _render_education),
+    ("Arbeidserfaring", "Arbeidserfaring", _render_experience),
+    ("Ferdigheter", "Ferdigheter", _render_skills),
+    ("Interesser og hobbyer", "Interesser_og_hobbyer", _render_interests),
+    ("Fremtidige mål", "Fremtidige_mål", _render_goals),
+]
+
+
+def _render_section(cv_dict, markup, title, render):
+    """Render one part of the CV, or "" if the section is empty."""
+    content = render(cv_dict, markup)
+    if title is None or not content:
+        return content
+    return markup.section.substitute(title=title, content=content)
+
+
+def _render_body(cv_dict, markup):
+    """Render the header and all non-empty sections."""
+    parts = [_render_section(cv_dict, markup, title, render) for title, _, render in _CV_SECTIONS]
+    return "\n\n".join(part for part in parts if part)
+
+
+def render_latex_cv(cv_dict):
+    """Render the LaTeX CV document from CV data without an LLM.
+
+    Fills the building blocks in src/templates.py with escaped CV data.
+    Empty entries and sections are left out.
+
+    Args:
+        cv_dict: Dictionary containing CV data
+
+    Returns:
+        str: Complete LaTeX document
+    """
+    return LATEX_DOCUMENT.substitute(preamble=LATEX_PREAMBLE, body=_render_body(cv_dict, LATEX_MARKUP))
+
+
+def render_html_cv(cv_dict):
+    """Render the CV as an HTML document with the same layout as the LaTeX CV.
+
+    Args:
+        cv_dict: Dictionary containing CV data
+
+    Returns:
+        str: Complete HTML document
+    """
+    return HTML_DOCUMENT.substitute(css=HTML_CSS, body=_render_body(cv_dict, HTML_MARKUP))
+
+
+# Rendered HTML sections for the live preview, keyed by a hash of the section data
+preview_cache = LRUCache(maxsize=PREVIEW_CACHE_SIZE)
+
+
+def render_html_preview(cv_dict):
+    """Render the CV as HTML for the live preview.
+
+    Sections are cached by a hash of their data, so only the sections that
+    changed since they were last rendered (in any session) are rendered again.
+
+    Args:
+        cv_dict: Dictionary containing CV data
+
+    Returns:
+        str: Complete HTML document
+    """
+    parts = []
+    for title, key, render in _CV_SECTIONS:
+        data = json.dumps([title, cv_dict.get(key)], ensure_ascii=False, sort_keys=True)
+        cache_key = hashlib.sha256(data.encode("utf-8")).hexdigest()
+        part = preview_cache.get(cache_key)
+        if part is None:
+            part = _render_section(cv_dict, HTML_MARKUP, title, render)
+            preview_cache.set(cache_key, part)
+        if part:
+            parts.append(part)
+
+    return HTML_DOCUMENT.substitute(css=HTML_CSS, body="\n\n".join(parts))
+
+
+def render_pdf_with_pymupdf(cv_dict):
+    """Render the CV PDF with PyMuPDF from the HTML version, without TeX.
 
     Args:
-        client: OpenAI client instance
         cv_dict: Dictionary containing CV data
 
     Returns:
-        bool: True if PDF was generated successfully
+        bytes: PDF content
     """
-    # Ensure output directory exists
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    page = pymupdf.paper_rect("letter")
+    margin = 2 / 2.54 * 72  # 2 cm, as in the LaTeX geometry
+    content = page + (margin, margin, -margin, -margin)
+
+    buffer = io.BytesIO()
+    story = pymupdf.Story(html=_render_body(cv_dict, HTML_MARKUP), user_css=HTML_CSS)
+    writer = pymupdf.DocumentWriter(buffer)
+    more = True
+    while more:
+        device = writer.begin_page(page)
+        more, _ = story.place(content)
+        story.draw(device)
+        writer.end_page()
+    writer.close()
+    return buffer.getvalue()
+
 
+@traced()
+def polish_cv_data(client, cv_dict):
+    """Use the LLM to clean up and rephrase CV data.
+
+    Args:
+        client: OpenAI client instance
+        cv_dict: Dictionary containing CV data
+
+    Returns:
+        dict: Polished CV data, or the original data if the output was unusable
+    """
     prompt = textwrap.dedent(f"""
-        - Lag en proffesjonell CV i latex format basert på JSON data.
+        - Rydd opp i denne CV dataen, du kan omformulere og fjerne punkter som er irrelevante, forvirrende eller duplikater.
         - Bruk informasjon som alder og erfaringer til å tilpasse CVen.
-        - Rydd opp i dataen, du kan omformulere og fjerne punkter som er irrelevante, forvirrende eller duplikater.
-        - Resultatet skal være en ferdig CV leveringsklar til arbeidsgiver (fjern tomme seksjoner).
-        - JSON data: {cv_dict}
-        - Bruk denne latex malen: {LATEX_TEMPLATE}
+        - Returner KUN den oppdaterte CV dataen i samme JSON format som du fikk.
+        - Sørg for at all dataen er optimalt formatert for en CV, leveringsklar til arbeidsgiver.
+        - CV data: {cv_dict}
         """)
 
-    latex_response_gen = client.chat.completions.create(
+    extra_args = {"response_format": CV_RESPONSE_FORMAT} if EXTRACTION_MODE == "structured" else {}
+    response = client.chat.completions.create(
         model=MODEL,
         messages=[
-            {"role": "system", "content": "You are a LaTeX generator."},
+            {"role": "system", "content": "You are a CV data cleaner."},
             {"role": "user", "content": prompt}
         ],
+        **extra_args,
     )
-    latex_cv_code = latex_response_gen.choices[0].message.content
+    record_token_usage("cv_polish", response.usage)
+
+    polished = parse_cv_json(response.choices[0].message.content)
+    return polished if polished else cv_dict
+
+
+# Precompiled preamble format, named by preamble hash so template changes rebuild it
+PREAMBLE_FORMAT_NAME = "cv_preamble_" + hashlib.sha256(LATEX_PREAMBLE.encode("utf-8")).hexdigest()[:12]
+FORMAT_BUILD_TIMEOUT = 120  # seconds
+
+_format_lock = threading.Lock()
+_format_state = {"built": False, "dir": None, "build_seconds": None}
+
+
+def build_preamble_format(format_dir=LATEX_FORMAT_DIR):
+    """Precompile LATEX_PREAMBLE into a pdflatex format file.
+
+    Uses the mylatexformat package, which dumps everything up to
+    \\begin{document} and skips that part of the document when compiling
+    against the format.
+
+    Args:
+        format_dir: Directory to write the format file to
+
+    Returns:
+        str: Absolute directory containing the format, or None if it could not be built
+    """
+    format_dir = os.path.abspath(format_dir)
+    if os.path.exists(os.path.join(format_dir, PREAMBLE_FORMAT_NAME + ".fmt")):
+        return format_dir
+    if shutil.which("pdflatex") is None:
+        return None
+
+    os.makedirs(format_dir, exist_ok=True)
+    source = PREAMBLE_FORMAT_NAME + ".tex"
+    with open(os.path.join(format_dir, source), mode="w", encoding="utf-8") as f:
+        f.write(LATEX_DOCUMENT.substitute(preamble=LATEX_PREAMBLE, body=""))
+
+    try:
+        subprocess.run(
+            [
+                "pdflatex", "-ini", "-interaction=nonstopmode", f"-jobname={PREAMBLE_FORMAT_NAME}",
+                "&pdflatex", "mylatexformat.ltx", source,
+            ],
+            cwd=format_dir,
+            capture_output=True,
+            timeout=FORMAT_BUILD_TIMEOUT,
+        )
+    except subprocess.TimeoutExpired:
+        log_error("latex_format_build_timeout", f"No format after {FORMAT_BUILD_TIMEOUT} s")
+        return None
+
+    if not os.path.exists(os.path.join(format_dir, PREAMBLE_FORMAT_NAME + ".fmt")):
+        log_error("latex_format_build_failed", "No format file written, compiling without it")
+        return None
+    return format_dir
+
+
+def get_preamble_format():
+    """Get the precompiled preamble format, building it once per process.
+
+    Returns:
+        str: Directory containing the format, or None to compile the full preamble
+    """
+    if not LATEX_USE_PRECOMPILED_PREAMBLE:
+        return None
+
+    with _format_lock:
+        if not _format_state["built"]:
+            start = time.perf_counter()
+            _format_state["dir"] = build_preamble_format()
+            _format_state["build_seconds"] = time.perf_counter() - start
+            _format_state["built"] = True
+        return _format_state["dir"]
+
+
+def _memory_limit_prefix():
+    """Command prefix capping the address space of pdflatex.
+
+    Uses util-linux prlimit rather than a preexec_fn, which is not safe to
+    use from the compile pool threads. Without prlimit (e.g. on Windows or
+    macOS) pdflatex runs without a memory limit.
+
+    Returns:
+        list: Command prefix, empty if no limit can be applied
+    """
+    if shutil.which("prlimit") is None:
+        return []
+    return ["prlimit", f"--as={LATEX_MEMORY_LIMIT_MB * 1024 * 1024}"]
 
-    # Save to outputs directory
-    tex_path = os.path.join(OUTPUT_DIR, "CV.tex")
-    with open(tex_path, mode="w", encoding="utf-8") as f:
-        f.write(latex_cv_code)
 
-    # Compile to PDF using pdflatex in the outputs directory
-    subprocess.run(
-        ["pdflatex", "-interaction=nonstopmode", "-output-directory", OUTPUT_DIR, tex_path]
+def run_pdflatex(tex_path, output_dir, format_dir=None, timeout=LATEX_COMPILE_TIMEOUT):
+    """Run one pdflatex pass, optionally against the preamble format.
+
+    Args:
+        tex_path: Path of the .tex file
+        output_dir: Directory for the PDF and auxiliary files
+        format_dir: Directory containing the precompiled preamble format (optional)
+        timeout: Seconds before pdflatex is killed
+
+    Returns:
+        subprocess.CompletedProcess: Result of the pdflatex run
+
+    Raises:
+        subprocess.TimeoutExpired: If pdflatex ran longer than timeout
+    """
+    command = _memory_limit_prefix() + ["pdflatex", "-interaction=nonstopmode", "-file-line-error", "-output-directory", output_dir]
+    env = None
+    if format_dir:
+        command.insert(command.index("pdflatex") + 1, f"-fmt={PREAMBLE_FORMAT_NAME}")
+        # Empty trailing entry keeps the default format search path
+        env = {**os.environ, "TEXFORMATS": format_dir + os.pathsep}
+    return subprocess.run(
+        command + [tex_path],
+        env=env,
+        capture_output=True,
+        timeout=timeout,
     )
 
-    return True
+
+# "! Message" or, with -file-line-error, "./CV.tex:12: Message"
+_LATEX_ERROR_PATTERN = re.compile(r"^(?:! (?P<message>.+)|(?P<file>\S+?\.\w+):(?P<line>\d+): (?P<file_message>.+))$")
+# "l.12 <source line>", follows a "! Message" error
+_LATEX_ERROR_LINE_PATTERN = re.compile(r"^l\.(?P<line>\d+) ")
+_LATEX_RERUN_PATTERN = re.compile(r"Rerun to get|Label\(s\) may have changed")
+
+
+def parse_latex_log(log_text):
+    """Extract errors and the rerun hint from a pdflatex log.
+
+    Args:
+        log_text: Contents of the .log file
+
+    Returns:
+        dict: "errors" (list of {"message", "line"}) and "rerun" (bool, LaTeX
+            asks for another pass to get cross-references right)
+    """
+    errors = []
+    for log_line in log_text.splitlines():
+        match = _LATEX_ERROR_PATTERN.match(log_line)
+        if match:
+            errors.append({
+                "message": (match.group("message") or match.group("file_message")).strip(),
+                "line": int(match.group("line")) if match.group("line") else None,
+            })
+            continue
+
+        match = _LATEX_ERROR_LINE_PATTERN.match(log_line)
+        if match and errors and errors[-1]["line"] is None:
+            errors[-1]["line"] = int(match.group("line"))
+
+    return {"errors": errors, "rerun": bool(_LATEX_RERUN_PATTERN.search(log_text))}
+
+
+def _read_file(path, mode="rb"):
+    """Read a file, or return None if it doesn't exist."""
+    try:
+        with open(path, mode, **({} if "b" in mode else {"encoding": "utf-8", "errors": "replace"})) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def compile_tex(tex_path, build_dir, format_dir=None):
+    """Compile a .tex file, running another pass only while references change.
+
+    A pass is repeated only if LaTeX asks for a rerun and the .aux file it
+    wrote differs from the one it read, up to LATEX_MAX_PASSES passes. Each
+    pass is killed after LATEX_COMPILE_TIMEOUT seconds and its duration is
+    recorded as the "pdflatex_pass" timing.
+
+    Args:
+        tex_path: Path of the .tex file
+        build_dir: Directory for the PDF and auxiliary files
+        format_dir: Directory containing the precompiled preamble format (optional)
+
+    Returns:
+        dict: "ok" (last pass exited cleanly), "passes" (seconds per pass),
+            "errors" (from parse_latex_log) and "timed_out"
+    """
+    name = os.path.splitext(os.path.basename(tex_path))[0]
+    aux_path = os.path.join(build_dir, name + ".aux")
+    log_path = os.path.join(build_dir, name + ".log")
+    report = {"ok": False, "passes": [], "errors": [], "timed_out": False}
+
+    for _ in range(LATEX_MAX_PASSES):
+        aux_before = _read_file(aux_path)
+        start = time.perf_counter()
+        try:
+            result = run_pdflatex(tex_path, build_dir, format_dir)
+        except subprocess.TimeoutExpired:
+            report["timed_out"] = True
+            report["ok"] = False
+            break
+        finally:
+            seconds = time.perf_counter() - start
+            report["passes"].append(seconds)
+            record_timing("pdflatex_pass", seconds)
+
+        log = parse_latex_log(_read_file(log_path, "r") or "")
+        report["errors"] = log["errors"]
+        report["ok"] = result.returncode == 0
+        if not report["ok"] or not log["rerun"] or _read_file(aux_path) == aux_before:
+            break
+
+    return report
 
 
-def generate_word_docx(client, cv_dict):
+# Bounded pool for pdflatex runs, shared by all sessions
+compile_executor = ThreadPoolExecutor(max_workers=LATEX_MAX_CONCURRENT_COMPILES, thread_name_prefix="pdflatex")
+
+_compile_lock = threading.Lock()
+_compile_stats = {
+    "queued": 0,
+    "running": 0,
+    "started": 0,
+    "succeeded": 0,
+    "failed": 0,
+    "timeouts": 0,
+    "pymupdf_renders": 0,
+    "total_wait_seconds": 0.0,
+    "max_wait_seconds": 0.0,
+    "last_errors": [],
+}
+
+# .aux of clean compiles by hash of the .tex source. Compiling the same
+# document again (e.g. after the PDF cache dropped it) then takes a single
+# pass. Only the exact same source is seeded, so a build never starts from
+# another CV's labels or page count.
+_aux_seeds = LRUCache(maxsize=CV_ARTIFACT_CACHE_SIZE)
+
+
+def get_compile_pool_stats():
+    """Get queue depth and wait-time statistics for the compile pool.
+
+    Returns:
+        dict: Current queue depth, running jobs, totals and wait times
+    """
+    with _compile_lock:
+        stats = dict(_compile_stats, last_errors=list(_compile_stats["last_errors"]))
+    stats["max_workers"] = LATEX_MAX_CONCURRENT_COMPILES
+    stats["mean_wait_seconds"] = stats["total_wait_seconds"] / stats["started"] if stats["started"] else 0.0
+    return stats
+
+
+def cleanup_old_builds(max_age=LATEX_BUILD_MAX_AGE):
+    """Remove build directories older than max_age seconds.
+
+    Successful builds are removed right away; this sweeps failed builds
+    (kept for inspection) and leftovers from earlier processes.
+
+    Args:
+        max_age: Age in seconds after which a build directory is removed
+    """
+    if not os.path.isdir(LATEX_BUILD_DIR):
+        return
+
+    cutoff = time.time() - max_age
+    for entry in os.scandir(LATEX_BUILD_DIR):
+        try:
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except FileNotFoundError:
+            # Removed concurrently by another session
+            continue
+
+
+def _compile_job(build_dir, submitted_at):
+    """Compile CV.tex in build_dir (runs on the compile pool)."""
+    wait = time.perf_counter() - submitted_at
+    with _compile_lock:
+        _compile_stats["queued"] -= 1
+        _compile_stats["running"] += 1
+        _compile_stats["started"] += 1
+        _compile_stats["total_wait_seconds"] += wait
+        _compile_stats["max_wait_seconds"] = max(_compile_stats["max_wait_seconds"], wait)
+
+    pdf_bytes = None
+    report = None
+    start = time.perf_counter()
+    try:
+        tex_path = os.path.join(build_dir, "CV.tex")
+        aux_path = os.path.join(build_dir, "CV.aux")
+        source_hash = hashlib.sha256(_read_file(tex_path)).hexdigest()
+        aux_seed = _aux_seeds.get(source_hash)
+        if aux_seed is not None:
+            with open(aux_path, "wb") as f:
+                f.write(aux_seed)
+
+        format_dir = get_preamble_format()
+        report = compile_tex(tex_path, build_dir, format_dir)
+        if format_dir and not report["ok"] and not report["timed_out"]:
+            # e.g. format built by another pdflatex version, fall back to the full preamble
+            report = compile_tex(tex_path, build_dir)
+
+        if report["ok"]:
+            _aux_seeds.set(source_hash, _read_file(aux_path))
+        elif report["errors"]:
+            log_error("pdflatex_errors", json.dumps(report["errors"][:5], ensure_ascii=False), {"build_dir": build_dir})
+
+        # nonstopmode still writes a PDF after recoverable errors, but not after a timeout
+        if not report["timed_out"]:
+            pdf_bytes = _read_file(os.path.join(build_dir, "CV.pdf"))
+        return pdf_bytes
+    finally:
+        record_timing("pdflatex_compile", time.perf_counter() - start)
+        with _compile_lock:
+            _compile_stats["running"] -= 1
+            _compile_stats["succeeded" if pdf_bytes else "failed"] += 1
+            if report is not None:
+                _compile_stats["timeouts"] += report["timed_out"]
+                _compile_stats["last_errors"] = report["errors"]
+
+
+def compile_latex_to_pdf(latex_code):
+    """Compile a LaTeX document in its own build directory through the compile pool.
+
+    Args:
+        latex_code: Complete LaTeX document
+
+    Returns:
+        bytes: PDF content, or None if compilation failed
+    """
+    cleanup_old_builds()
+    os.makedirs(LATEX_BUILD_DIR, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix="cv_", dir=LATEX_BUILD_DIR)
+
+    with open(os.path.join(build_dir, "CV.tex"), mode="w", encoding="utf-8") as f:
+        f.write(latex_code)
+
+    with _compile_lock:
+        _compile_stats["queued"] += 1
+    pdf_bytes = submit_traced(compile_executor, _compile_job, build_dir, time.perf_counter()).result()
+
+    # Keep failed builds (with their logs) until cleanup_old_builds sweeps them
+    if pdf_bytes is not None:
+        shutil.rmtree(build_dir, ignore_errors=True)
+    return pdf_bytes
+
+
+# Stages reported by generate_cv_documents, in order
+CV_GENERATION_STAGES = ("cleanup", "render", "compile", "docx")
+
+
+def _report(progress, stage, done=False):
+    if progress is not None:
+        progress(stage, done=done)
+
+
+def _preferred_pdf_backend():
+    """The PDF backend to use when the compile pool isn't busy."""
+    if PDF_BACKEND == "pymupdf" or (PDF_BACKEND == "auto" and shutil.which("pdflatex") is None):
+        return "pymupdf"
+    return "latex"
+
+
+def choose_pdf_backend():
+    """Pick the PDF backend for the next CV.
+
+    With PDF_BACKEND = "auto", LaTeX is used unless pdflatex is missing or
+    PDF_FALLBACK_QUEUE_DEPTH compiles are already waiting for the pool.
+
+    Returns:
+        str: "latex" or "pymupdf"
+    """
+    backend = _preferred_pdf_backend()
+    if backend == "latex" and PDF_BACKEND == "auto":
+        with _compile_lock:
+            queued = _compile_stats["queued"]
+        if queued >= PDF_FALLBACK_QUEUE_DEPTH:
+            return "pymupdf"
+    return backend
+
+
+@traced()
+def render_cv_pdf(cv_dict, progress=None):
+    """Render the CV PDF with the backend picked by choose_pdf_backend.
+
+    In "auto" mode a failed LaTeX compile falls back to PyMuPDF as well.
+
+    Args:
+        cv_dict: Dictionary containing CV data
+        progress: Optional progress callback (see generate_cv_documents)
+
+    Returns:
+        tuple: (pdf_bytes, backend), pdf_bytes is None if compilation failed
+    """
+    backend = choose_pdf_backend()
+    current_span().set(backend=backend)
+    if backend == "latex":
+        _report(progress, "render")
+        latex_code = render_latex_cv(cv_dict)
+        _report(progress, "render", done=True)
+
+        _report(progress, "compile")
+        pdf_bytes = compile_latex_to_pdf(latex_code)
+        _report(progress, "compile", done=True)
+
+        if pdf_bytes is not None or PDF_BACKEND == "latex":
+            return pdf_bytes, backend
+        log_event("pdf_backend_fallback", {"from": "latex", "to": "pymupdf"})
+        backend = "pymupdf"
+        current_span().set(backend=backend, fallback=True)
+
+    # PyMuPDF lays out and writes the PDF in one step
+    _report(progress, "render")
+    start = time.perf_counter()
+    pdf_bytes = render_pdf_with_pymupdf(cv_dict)
+    record_timing("pymupdf_render", time.perf_counter() - start)
+    with _compile_lock:
+        _compile_stats["pymupdf_renders"] += 1
+    _report(progress, "render", done=True)
+    _report(progress, "compile", done=True)
+    return pdf_bytes, backend
+
+
+@traced()
+def json_to_cv_pdf(client, cv_dict, polish=CV_POLISH_WITH_LLM):
+    """Generates a CV PDF from the JSON data.
+
+    The LaTeX is rendered locally from the data (see render_latex_cv). The LLM
+    is only used, optionally, to polish the text fields first. Each call
+    compiles in its own build directory, so concurrent sessions can't
+    overwrite each other's files. Without pdflatex, or when the compile pool
+    is busy, the PDF is rendered with PyMuPDF instead (see choose_pdf_backend).
+
+    Args:
+        client: OpenAI client instance
+        cv_dict: Dictionary containing CV data
+        polish: Polish the CV data with the LLM before rendering
+
+    Returns:
+        bytes: PDF content, or None if compilation failed
+    """
+    if polish:
+        cv_dict = polish_cv_data(client, cv_dict)
+
+    return render_cv_pdf(cv_dict)[0]
+
+
+@traced()
+def generate_word_docx(client, cv_dict, polish=CV_POLISH_WITH_LLM):
     """Generates a CV Word document from the JSON data.
 
     Args:
         client: OpenAI client instance
         cv_dict: Dictionary containing CV data
+        polish: Polish the CV data with the LLM before rendering
 
     Returns:
         BytesIO: Buffer containing the Word document
     """
+    if polish:
+        cv_dict = polish_cv_data(client, cv_dict)
+
+    return build_word_docx(cv_dict)
+
+
+def _source_digest(*paths):
+    """Hash the contents of source files."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+# Covers the renderers (this module) and every template block they use, so
+# editing either gets new cache keys. Bump CV_TEMPLATE_VERSION for changes
+# outside these files, e.g. a TeX Live or python-docx upgrade.
+ARTIFACT_TEMPLATE_VERSION = f"{CV_TEMPLATE_VERSION}-{_source_digest(__file__, cv_templates.__file__)}"
+
+# Generated (pdf_bytes, docx_bytes) by artifact key: memory first, then disk
+artifact_cache = LRUCache(maxsize=CV_ARTIFACT_CACHE_SIZE)
+artifact_disk_cache = DiskCache(CV_ARTIFACT_CACHE_DIR, CV_ARTIFACT_DISK_CACHE_MAX_BYTES)
+
+
+def cv_artifact_key(cv_dict, polish=CV_POLISH_WITH_LLM, backend=None):
+    """Build the cache key for generated CV documents.
+
+    Args:
+        cv_dict: Dictionary containing CV data
+        polish: Whether the data is polished with the LLM before rendering
+        backend: PDF backend, defaults to the preferred one (see _preferred_pdf_backend)
+
+    Returns:
+        str: Hash of the canonical CV data, template version and settings
+    """
+    canonical = json.dumps(
+        {
+            "cv": cv_dict,
+            "template": ARTIFACT_TEMPLATE_VERSION,
+            "backend": backend or _preferred_pdf_backend(),
+            "model": MODEL if polish else None,
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# Disk entries hold both documents: PDF length (8 bytes, big-endian), PDF, DOCX
+_DOCUMENTS_HEADER = struct.Struct(">Q")
+
+
+def _pack_documents(documents):
+    pdf_bytes, docx_bytes = documents
+    return _DOCUMENTS_HEADER.pack(len(pdf_bytes)) + pdf_bytes + docx_bytes
+
+
+def _unpack_documents(data):
+    """Split a disk entry into (pdf_bytes, docx_bytes), or None if it is truncated."""
+    if len(data) < _DOCUMENTS_HEADER.size:
+        return None
+    (pdf_size,) = _DOCUMENTS_HEADER.unpack_from(data)
+    end = _DOCUMENTS_HEADER.size + pdf_size
+    if len(data) <= end:
+        return None
+    return data[_DOCUMENTS_HEADER.size:end], data[end:]
+
+
+def _get_cached_documents(key):
+    """Look up generated documents in memory, then on disk."""
+    documents = artifact_cache.get(key)
+    if documents is not None:
+        return documents
+
+    data = artifact_disk_cache.get(f"{key}.cv")
+    documents = _unpack_documents(data) if data is not None else None
+    if documents is None:
+        return None
+
+    artifact_cache.set(key, documents)
+    return documents
+
+
+def _cache_documents(key, documents):
+    artifact_cache.set(key, documents)
+    try:
+        artifact_disk_cache.set(f"{key}.cv", _pack_documents(documents))
+    except OSError as e:
+        log_error("cv_artifact_cache_write_failed", str(e))
+
+
+def get_artifact_cache_stats():
+    """Get statistics for the generated CV cache.
+
+    Returns:
+        dict: Memory and disk tier statistics
+    """
+    return {
+        "template_version": ARTIFACT_TEMPLATE_VERSION,
+        "memory": artifact_cache.stats(),
+        "disk": artifact_disk_cache.stats(),
+    }
+
+
+def _build_word_docx_bytes(cv_dict, progress=None):
+    _report(progress, "docx")
+    docx_bytes = build_word_docx(cv_dict).getvalue()
+    _report(progress, "docx", done=True)
+    return docx_bytes
+
+
+@traced()
+def generate_cv_documents(client, cv_dict, polish=CV_POLISH_WITH_LLM, progress=None):
+    """Generates both the CV PDF and Word document from one cleanup pass.
+
+    Results are cached by a hash of the CV data and template version, so
+    generating the same CV again skips the LLM and the compile. Otherwise
+    the CV data is polished once, then the Word document is built on the
+    shared executor while the PDF compiles, so the total time is roughly
+    that of the slower renderer.
+
+    Args:
+        client: OpenAI client instance
+        cv_dict: Dictionary containing CV data
+        polish: Polish the CV data with the LLM before rendering
+        progress: Optional callback progress(stage, done=False) called when
+            each of CV_GENERATION_STAGES starts and finishes
+
+    Returns:
+        tuple: (pdf_bytes, docx_bytes), pdf_bytes is None if compilation failed
+    """
+    # PyMuPDF output is keyed apart from LaTeX output, so installing pdflatex
+    # later doesn't keep serving the PyMuPDF PDFs
+    preferred_backend = _preferred_pdf_backend()
+    key = cv_artifact_key(cv_dict, polish, preferred_backend)
+    documents = _get_cached_documents(key)
+    current_span().set(cache_hit=documents is not None)
+    if documents is not None:
+        for stage in CV_GENERATION_STAGES:
+            _report(progress, stage, done=True)
+        return documents
+
+    _report(progress, "cleanup")
+    if polish:
+        cv_dict = polish_cv_data(client, cv_dict)
+    _report(progress, "cleanup", done=True)
+
+    docx_future = submit_traced(executor, _build_word_docx_bytes, cv_dict, progress)
+
+    pdf_bytes, backend = render_cv_pdf(cv_dict, progress)
+    documents = (pdf_bytes, docx_future.result())
+
+    # Failed compiles and PDFs rendered by the fallback after a failed or
+    # queued compile are not cached, so the next attempt gets LaTeX
+    if pdf_bytes is not None and backend == preferred_backend:
+        _cache_documents(key, documents)
+    return documents
+
+
+# Named styles of the Word base template (see _build_docx_base_template)
+DOCX_TITLE_STYLE = "CV Title"
+DOCX_HEADING_STYLE = "CV Heading"
+DOCX_SUBHEADING_STYLE = "CV Subheading"
+DOCX_BULLET_STYLE = "CV Bullet"
+DOCX_ENTRY_STYLE = "CV Entry"
+DOCX_CONTINUE_STYLE = "CV Continue"
+DOCX_LABEL_STYLE = "CV Label"
+
+# Built-in styles kept in the base template (the CV styles' bases and their linked
+# character styles). python-docx looks styles up by scanning the whole style list
+# for every paragraph, so dropping the other ~150 built-ins speeds up building.
+DOCX_BUILTIN_STYLES = {
+    "Normal", "Default Paragraph Font", "No List",
+    "Heading 1", "Heading 1 Char", "Heading 3", "Heading 3 Char",
+    "List Bullet", "List Continue",
+}
+
+_docx_base_lock = threading.Lock()
+_docx_base = {"data": None}
+
+
+def _build_docx_base_template():
+    """Build the empty Word document all CVs start from, with the CV styles defined.
+
+    Returns:
+        bytes: The saved .docx package
+    """
     # Lazy import to avoid requiring docx if not used
     from docx import Document
+    from docx.enum.style import WD_STYLE_TYPE
     from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+    from docx.oxml.ns import qn
     from docx.shared import Pt
 
-    # Get LLM to clean up the CV data
-    prompt = textwrap.dedent(f"""
-        - Rydd opp i denne CV dataen, du kan omformulere og fjerne punkter som er irrelevante, forvirrende eller duplikater.
-        - Returner KUN den oppdaterte CV dataen i samme JSON format som du fikk.
-        - Sørg for at all dataen er optimalt formatert for en CV.
-        - Din output data skal brukes direkte til å generere en CV i Word docx.
-        - CV data: {cv_dict}
-        """)
+    doc = Document()
+    styles = doc.styles
 
-    json_response_gen = client.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": "You are a CV data cleaner."},
-            {"role": "user", "content": prompt}
-        ],
-    )
-    json_response_str = json_response_gen.choices[0].message.content
+    for style in list(styles):
+        # Default styles (e.g. the table default) must stay
+        if style.name not in DOCX_BUILTIN_STYLES and style.element.get(qn("w:default")) != "1":
+            style.delete()
 
-    try:
-        import json
-        cv_dict = json.loads(json_response_str)
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON: {e}")
-        return None
+    def add_style(name, base, style_type=WD_STYLE_TYPE.PARAGRAPH):
+        style = styles.add_style(name, style_type)
+        style.base_style = styles[base]
+        style.quick_style = True
+        return style
+
+    title = add_style(DOCX_TITLE_STYLE, "Normal")
+    title.font.bold = True
+    title.font.size = Pt(24)
+    title.paragraph_format.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+    add_style(DOCX_HEADING_STYLE, "Heading 1")
+    add_style(DOCX_SUBHEADING_STYLE, "Heading 3")
+    add_style(DOCX_BULLET_STYLE, "List Bullet")
+    add_style(DOCX_ENTRY_STYLE, "List Bullet").font.bold = True
+    add_style(DOCX_CONTINUE_STYLE, "List Continue")
+    add_style(DOCX_LABEL_STYLE, "Default Paragraph Font", WD_STYLE_TYPE.CHARACTER).font.bold = True
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def get_docx_base_template():
+    """Get the Word base template, building it once per process.
+
+    Returns:
+        bytes: The saved .docx package, to be opened with docx.Document(BytesIO(...))
+    """
+    with _docx_base_lock:
+        if _docx_base["data"] is None:
+            _docx_base["data"] = _build_docx_base_template()
+        return _docx_base["data"]
+
+
+@traced()
+def build_word_docx(cv_dict):
+    """Build a CV Word document from (already polished) CV data.
+
+    Every document is a fresh in-memory copy of the base template, so all
+    formatting comes from its named styles.
+
+    Args:
+        cv_dict: Dictionary containing CV data
+
+    Returns:
+        BytesIO: Buffer containing the Word document
+    """
+    # Lazy import to avoid requiring docx if not used
+    from docx import Document
+
+    doc = Document(io.BytesIO(get_docx_base_template()))
+
+    def bullet(text, style=DOCX_BULLET_STYLE):
+        doc.add_paragraph(text, style=style)
+
+    def details(text):
+        if text:
+            doc.add_paragraph(text, style=DOCX_CONTINUE_STYLE)
 
-    # Create Word document
-    doc = Document()
     personalia = cv_dict.get("Personalia", {})
 
     # Title with name
-    title = doc.add_paragraph()
-    title_run = title.add_run(personalia.get("Navn", ""))
-    title_run.bold = True
-    title_run.font.size = Pt(24)
-    title.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    doc.add_paragraph(personalia.get("Navn", ""), style=DOCX_TITLE_STYLE)
 
     # Personalia details
     for key, value in personalia.items():
         if key == "Navn" or not value:
             continue
         p = doc.add_paragraph()
-        run = p.add_run(f"{key}: ")
-        run.bold = True
+        p.add_run(f"{key}: ", style=DOCX_LABEL_STYLE)
         p.add_run(str(value))
 
     doc.add_paragraph()
@@ -118,90 +1163,73 @@ def generate_word_docx(client, cv_dict):
     # Education
     utdanning = cv_dict.get("Utdanning", [])
     if utdanning:
-        doc.add_heading("Utdanning", level=1)
+        doc.add_paragraph("Utdanning", style=DOCX_HEADING_STYLE)
         for entry in utdanning:
-            summary = f"{entry.get('Grad', '')} – {entry.get('Skole', '')} ({entry.get('Trinn/ferdig_år', '')})"
-            doc.add_paragraph(summary, style="List Bullet")
-            if entry.get("Ytterligere_informasjon"):
-                doc.add_paragraph(entry["Ytterligere_informasjon"], style="List Continue")
+            bullet(f"{entry.get('Grad', '')} – {entry.get('Skole', '')} ({entry.get('Trinn/Ferdig_år', '')})")
+            details(entry.get("Ytterligere_informasjon"))
 
     # Work experience
     arbeid = cv_dict.get("Arbeidserfaring", {})
     if arbeid.get("Stillinger") or arbeid.get("Dugnad"):
-        doc.add_heading("Arbeidserfaring", level=1)
+        doc.add_paragraph("Arbeidserfaring", style=DOCX_HEADING_STYLE)
         for stilling in arbeid.get("Stillinger", []):
-            bullet = doc.add_paragraph(style="List Bullet")
-            header = bullet.add_run(
-                f"{stilling.get('Tittel', '')}, {stilling.get('Firma', '')}, {stilling.get('Periode', '')}"
+            bullet(
+                f"{stilling.get('Tittel', '')}, {stilling.get('Firma', '')}, {stilling.get('Periode', '')}",
+                style=DOCX_ENTRY_STYLE
             )
-            header.bold = True
-            if stilling.get("Beskrivelse"):
-                doc.add_paragraph(stilling["Beskrivelse"], style="List Continue")
+            details(stilling.get("Beskrivelse"))
 
         if arbeid.get("Dugnad"):
-            doc.add_paragraph().add_run("Dugnad").italic = True
+            doc.add_paragraph("Dugnad", style=DOCX_SUBHEADING_STYLE)
             for dugnad in arbeid["Dugnad"]:
-                doc.add_paragraph(
-                    f"{dugnad.get('Oppdrag', '')} ({dugnad.get('Periode', '')})",
-                    style="List Bullet"
-                )
-                if dugnad.get("Beskrivelse"):
-                    doc.add_paragraph(dugnad["Beskrivelse"], style="List Continue")
+                bullet(f"{dugnad.get('Oppdrag', '')} ({dugnad.get('Periode', '')})")
+                details(dugnad.get("Beskrivelse"))
 
     # Skills
     ferdigheter = cv_dict.get("Ferdigheter", {})
     if any(ferdigheter.values()):
-        doc.add_heading("Ferdigheter", level=1)
+        doc.add_paragraph("Ferdigheter", style=DOCX_HEADING_STYLE)
         for skill in ferdigheter.get("Ferdigheter_og_kompetanser", []):
-            doc.add_paragraph(
-                f"{skill.get('Ferdighet', '')} – {skill.get('Nivå', '')}",
-                style="List Bullet"
-            )
-            if skill.get("Beskrivelse"):
-                doc.add_paragraph(skill["Beskrivelse"], style="List Continue")
+            bullet(f"{skill.get('Ferdighet', '')} – {skill.get('Nivå', '')}")
+            details(skill.get("Beskrivelse"))
 
         språk = ferdigheter.get("Språk", [])
         if språk:
-            doc.add_paragraph("Språk:", style="Heading 3")
+            doc.add_paragraph("Språk:", style=DOCX_SUBHEADING_STYLE)
             for item in språk:
-                doc.add_paragraph(
-                    f"{item.get('Språk', '')}: {item.get('Nivå', '')}",
-                    style="List Bullet"
-                )
+                bullet(f"{item.get('Språk', '')}: {item.get('Nivå', '')}")
 
         sertifikater = ferdigheter.get("Sertifikater", [])
         if sertifikater:
-            doc.add_paragraph("Sertifikater:", style="Heading 3")
+            doc.add_paragraph("Sertifikater:", style=DOCX_SUBHEADING_STYLE)
             for cert in sertifikater:
-                doc.add_paragraph(cert, style="List Bullet")
+                bullet(cert)
 
         annet = ferdigheter.get("Annet", [])
         if annet:
-            doc.add_paragraph("Annet:", style="Heading 3")
+            doc.add_paragraph("Annet:", style=DOCX_SUBHEADING_STYLE)
             for entry in annet:
-                doc.add_paragraph(entry, style="List Bullet")
+                bullet(entry)
 
     # Interests
     interesser = cv_dict.get("Interesser_og_hobbyer", [])
     if interesser:
-        doc.add_heading("Interesser og hobbyer", level=1)
+        doc.add_paragraph("Interesser og hobbyer", style=DOCX_HEADING_STYLE)
         for entry in interesser:
-            doc.add_paragraph(entry.get("Interesse/Hobby", ""), style="List Bullet")
-            if entry.get("Beskrivelse"):
-                doc.add_paragraph(entry["Beskrivelse"], style="List Continue")
+            bullet(entry.get("Interesse/Hobby", ""))
+            details(entry.get("Beskrivelse"))
 
     # Future goals
     mål = cv_dict.get("Fremtidige_mål", {})
-    if mål:
-        doc.add_heading("Fremtidige mål", level=1)
+    if any(mål.values()):
+        doc.add_paragraph("Fremtidige mål", style=DOCX_HEADING_STYLE)
         if mål.get("Fremtidsutsikter_og_mål"):
             doc.add_paragraph(mål["Fremtidsutsikter_og_mål"])
         if mål.get("Jobbønsker"):
-            doc.add_paragraph("Jobbønsker:", style="Heading 3")
+            doc.add_paragraph("Jobbønsker:", style=DOCX_SUBHEADING_STYLE)
             for entry in mål["Jobbønsker"]:
-                doc.add_paragraph(entry.get("Jobbønske", ""), style="List Bullet")
-                if entry.get("Begrunnelse"):
-                    doc.add_paragraph(entry["Begrunnelse"], style="List Continue")
+                bullet(entry.get("Jobbønske", ""))
+                details(entry.get("Begrunnelse"))
 
     # Save to buffer
     buffer = io.BytesIO()
@@ -1,65 +1,542 @@
 """Data processing utilities for CV data management."""
 
+import copy
 import json
 import textwrap
 import pymupdf
 
-from src.schemas import CV_SCHEMA
+from src.schemas import (
+    CV_SCHEMA,
+    CV_RESPONSE_FORMAT,
+    CV_PATCH_OPS,
+    CV_PATCH_PATH_SEPARATOR,
+    CV_LIST_IDENTITY_KEYS,
+)
+from src.metrics import log_error, log_event, record_token_usage
 
 
-def deep_update(original, new_data):
+def _normalize(value):
+    """Normalize a primitive value for comparisons."""
+    return " ".join(str(value).split()).casefold()
+
+
+def _fingerprint(item):
+    """Hashable fingerprint of a list item, for duplicate detection."""
+    if isinstance(item, (dict, list)):
+        return json.dumps(item, sort_keys=True, ensure_ascii=False)
+    return _normalize(item)
+
+
+def _identity(item, keys):
+    """Identity of a list entry from its identity keys, None if incomplete."""
+    if not keys or not isinstance(item, dict):
+        return None
+    values = tuple(_normalize(item.get(key) or "") for key in keys)
+    return values if all(values) else None
+
+
+def _compatible(existing, new):
+    """Check that no filled-in field of new conflicts with existing."""
+    for key, value in new.items():
+        if isinstance(value, (dict, list)) or _is_blank(value):
+            continue
+        current = existing.get(key)
+        if not _is_blank(current) and _normalize(current) != _normalize(value):
+            return False
+    return True
+
+
+def _shares_field(existing, new):
+    """Check that existing and new have at least one filled-in field in common with equal values."""
+    for key, value in new.items():
+        if isinstance(value, (dict, list)) or _is_blank(value):
+            continue
+        current = existing.get(key)
+        if not _is_blank(current) and _normalize(current) == _normalize(value):
+            return True
+    return False
+
+
+def _continues_entry(existing, new, keys):
+    """Check whether new describes the same, still incomplete, entry as existing."""
+    return (
+        isinstance(existing, dict)
+        and _identity(existing, keys) is None
+        and _shares_field(existing, new)
+        and _compatible(existing, new)
+    )
+
+
+def _merge_list(original, new_items, path):
+    """Merge new list items into a list using hash indexes (see deep_update)."""
+    keys = CV_LIST_IDENTITY_KEYS.get(path)
+
+    by_identity = {}
+    fingerprints = set()
+    for i, item in enumerate(original):
+        identity = _identity(item, keys)
+        if identity is not None:
+            by_identity.setdefault(identity, i)
+        fingerprints.add(_fingerprint(item))
+
+    for item in new_items:
+        if _is_blank(item):
+            continue
+        fingerprint = _fingerprint(item)
+        if fingerprint in fingerprints:
+            continue
+
+        if not isinstance(item, dict):
+            original.append(item)
+            fingerprints.add(fingerprint)
+            continue
+
+        identity = _identity(item, keys)
+        position = by_identity.get(identity) if identity is not None else None
+
+        # Otherwise keep filling in the last entry if it has no identity yet
+        # and the item repeats one of its fields, e.g. when an entry is
+        # described over several turns
+        if position is None and original and _continues_entry(original[-1], item, keys):
+            position = len(original) - 1
+
+        if position is None:
+            original.append(item)
+            position = len(original) - 1
+        else:
+            fingerprints.discard(_fingerprint(original[position]))
+            original[position] = deep_update(original[position], item, path)
+
+        identity = _identity(original[position], keys)
+        if identity is not None:
+            by_identity.setdefault(identity, position)
+        fingerprints.add(_fingerprint(original[position]))
+
+    return original
+
+
+def deep_update(original, new_data, path=""):
     """
-    Recursively update a nested dict or list with new values.
-    Dicts are merged, lists are updated element by element.
+    Recursively merge new CV data into existing CV data.
+
+    Dicts are merged key by key and empty new values never overwrite filled-in
+    ones. List entries are matched by their identity keys from
+    CV_LIST_IDENTITY_KEYS (e.g. Skole + Grad) through a hash index. An entry
+    without a match continues the last entry if that one has no identity yet,
+    they share a filled-in field and no field conflicts. Otherwise it is
+    appended. Exact duplicates are skipped.
 
     Args:
         original: Original data structure (dict or list)
         new_data: New data to merge in
+        path: Path of original in the CV data (used to look up identity keys)
 
     Returns:
         Updated data structure
     """
     if isinstance(original, dict) and isinstance(new_data, dict):
         for k, v in new_data.items():
+            child_path = f"{path}{CV_PATCH_PATH_SEPARATOR}{k}" if path else k
             if k in original:
-                original[k] = deep_update(original[k], v)
+                original[k] = deep_update(original[k], v, child_path)
             else:
                 original[k] = v
         return original
 
     elif isinstance(original, list) and isinstance(new_data, list):
-        # Update existing items by index
-        for i, v in enumerate(new_data):
-            print("new data item:")
-            print(i)
-            print(new_data)
-
-            # Catch primitive types in lists
-            if isinstance(v, (str, int, float)) or v is None:
-                print("primitive in list")
-                if v not in original:
-                    original.append(v)
-                continue
-
-            # If original list is empty, just append the new item
-            if len(original) == 0:
-                original.append(v)
-                continue
-
-            for key, value in v.items():
-                if key in original[-1] and (original[-1][key] == "" or original[-1][key] == value):
-                    original[-1] = deep_update(original[-1], v)
-                elif key not in original[-1]:
-                    original[-1][key] = v[key]
-                else:
-                    original.append(new_data[i])
-                    print("appending")
-                    print(new_data[i])
-        return original
+        return _merge_list(original, new_data, path)
+
+    else:
+        # Primitive (str, int, etc.) → overwrite unless the new value is empty
+        return original if _is_blank(new_data) and not _is_blank(original) else new_data
+
+
+_INVALID = object()
+
+
+def compile_validator(template):
+    """Compile a CV_SCHEMA-style template into a fast validating cleaner.
+
+    The schema is walked once up front, so validating a value is a tree of
+    plain function calls without any schema lookups.
+
+    Args:
+        template: CV_SCHEMA or a part of it
+
+    Returns:
+        callable: check(value, path, errors) returning the value with invalid
+            parts dropped (or _INVALID), appending error strings to errors
+    """
+    if isinstance(template, dict):
+        fields = {key: compile_validator(value) for key, value in template.items()}
+
+        def check_object(value, path, errors):
+            if not isinstance(value, dict):
+                errors.append(f"{path}: expected object")
+                return _INVALID
+            cleaned = {}
+            for key, item in value.items():
+                # Unknown values are null (see schemas.to_json_schema)
+                if item is None:
+                    continue
+                check = fields.get(key)
+                if check is None:
+                    errors.append(f"{path}/{key}: unknown field")
+                    continue
+                item = check(item, f"{path}/{key}", errors)
+                if item is not _INVALID:
+                    cleaned[key] = item
+            return cleaned
+
+        return check_object
+
+    if isinstance(template, list):
+        check_item = compile_validator(template[0] if template else "")
+
+        def check_array(value, path, errors):
+            if not isinstance(value, list):
+                errors.append(f"{path}: expected array")
+                return _INVALID
+            cleaned = []
+            for i, item in enumerate(value):
+                if item is None:
+                    continue
+                item = check_item(item, f"{path}/{i}", errors)
+                if item is not _INVALID:
+                    cleaned.append(item)
+            return cleaned
+
+        return check_array
+
+    def check_string(value, path, errors):
+        if isinstance(value, str):
+            return value
+        if value is None:
+            return ""
+        if isinstance(value, (int, float)):
+            return str(value)
+        errors.append(f"{path}: expected string")
+        return _INVALID
+
+    return check_string
+
+
+_validate_cv = compile_validator(CV_SCHEMA)
+
+
+def validate_cv_data(data):
+    """Validate CV data against CV_SCHEMA, dropping the invalid parts.
+
+    Missing fields are allowed, since extraction returns partial data, and
+    null fields are dropped.
+
+    Args:
+        data: Parsed CV data
+
+    Returns:
+        tuple: (cleaned data or None, list of error strings)
+    """
+    errors = []
+    cleaned = _validate_cv(data, "", errors)
+    return (None if cleaned is _INVALID else cleaned), errors
+
+
+def repair_truncated_json(json_str):
+    """Close a JSON document that was cut off mid-output.
+
+    Drops the trailing incomplete value and closes open strings, arrays and
+    objects, so whatever was complete can still be used.
+
+    Args:
+        json_str: Possibly truncated JSON text
+
+    Returns:
+        str: JSON text that should parse, or the input if nothing could be repaired
+    """
+    stack = []
+    in_string = False
+    escaped = False
+    after_colon = False
+    # Position after the last complete value/container entry, with the stack at that point
+    last_safe = None
+
+    for i, ch in enumerate(json_str):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+                # A closed string is a complete value unless it is an object key
+                if stack and (stack[-1] == "[" or after_colon):
+                    last_safe = (i + 1, list(stack))
+                after_colon = False
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch == ":":
+            after_colon = True
+        elif ch in "{[":
+            stack.append(ch)
+            after_colon = False
+            last_safe = (i + 1, list(stack))
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            after_colon = False
+            last_safe = (i + 1, list(stack))
+        elif ch == "," and stack:
+            last_safe = (i, list(stack))
+
+    if not stack and not in_string:
+        return json_str
+    if last_safe is None:
+        return json_str
+
+    end, open_stack = last_safe
+    repaired = json_str[:end].rstrip().rstrip(",")
+    closers = {"{": "}", "[": "]"}
+    return repaired + "".join(closers[c] for c in reversed(open_stack))
+
+
+def parse_cv_json(json_str):
+    """Parse LLM JSON output into CV data, repairing and validating it.
+
+    Markdown code fences are stripped, truncated output is repaired and the
+    result is validated against CV_SCHEMA with invalid parts dropped.
+
+    Args:
+        json_str: JSON string from the LLM
+
+    Returns:
+        dict: Cleaned CV data, or None if nothing usable could be parsed
+    """
+    text = json_str.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0] if text.rstrip().endswith("```") else text
+
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        try:
+            data = json.loads(repair_truncated_json(text))
+        except json.JSONDecodeError as e:
+            log_error("cv_json_decode_failed", str(e), {"length": len(text)})
+            return None
+        log_event("cv_json_repaired", {"length": len(text)})
+
+    cleaned, errors = validate_cv_data(data)
+    if errors:
+        log_error("cv_data_invalid", "; ".join(errors[:10]), {"error_count": len(errors)})
+    return cleaned
+
+
+def _blank_value(template):
+    """Empty value shaped like a schema template (lists start empty)."""
+    if isinstance(template, dict):
+        return {key: _blank_value(value) for key, value in template.items()}
+    if isinstance(template, list):
+        return []
+    return ""
+
+
+def _is_blank(value):
+    """Check whether a value contains no filled-in data."""
+    if isinstance(value, dict):
+        return all(_is_blank(v) for v in value.values())
+    if isinstance(value, list):
+        return all(_is_blank(v) for v in value)
+    return value in ("", None)
+
+
+def _patch_step(data, template, segment):
+    """Resolve one path segment, creating missing objects from the schema."""
+    if isinstance(template, dict):
+        if segment not in template:
+            raise KeyError(f"unknown field {segment!r}")
+        child_template = template[segment]
+        if not isinstance(data.get(segment), type(_blank_value(child_template))):
+            data[segment] = _blank_value(child_template)
+        return data[segment], child_template
+
+    if isinstance(template, list):
+        return data[int(segment)], (template[0] if template else "")
+
+    raise TypeError(f"cannot descend into field with {segment!r}")
+
+
+class PatchError(ValueError):
+    """A patch operation's value doesn't fit the field it targets."""
+
+
+_check_text = compile_validator("")
+
 
+def _patch_text_value(value):
+    """Text for a text field or string list item from a patch value (numbers are converted).
+
+    Raises:
+        PatchError: If value is an object or a list
+    """
+    errors = []
+    text = _check_text(value, "value", errors)
+    if errors:
+        raise PatchError(", ".join(errors))
+    return text
+
+
+def _patch_object_value(value, item_template):
+    """Fields for a new list item from an append value (an object or JSON object text).
+
+    Raises:
+        PatchError: If value is not an object or a field doesn't match item_template
+    """
+    if _is_blank(value):
+        return {}
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            raise PatchError("append to a list of objects needs an object value") from None
+    if not isinstance(value, dict):
+        raise PatchError("append to a list of objects needs an object value")
+
+    errors = []
+    fields = compile_validator(item_template)(value, "value", errors)
+    if errors:
+        raise PatchError(", ".join(errors))
+    return fields
+
+
+def _apply_patch(cv_dict, patch):
+    """Apply a single patch operation (see apply_cv_patches)."""
+    op = patch.get("op")
+    value = patch.get("value", "")
+    if op not in CV_PATCH_OPS:
+        raise ValueError(f"unknown op {op!r}")
+
+    segments = (patch.get("path") or "").split(CV_PATCH_PATH_SEPARATOR)
+    parent, template = cv_dict, CV_SCHEMA
+    for segment in segments[:-1]:
+        parent, template = _patch_step(parent, template, segment)
+    last = segments[-1]
+
+    # Target is a list item, addressed by index
+    if isinstance(template, list):
+        index = int(last)
+        item_template = template[0] if template else ""
+        if op == "remove":
+            del parent[index]
+        elif op == "set" and not isinstance(item_template, (dict, list)):
+            parent[index] = _patch_text_value(value)
+        else:
+            raise TypeError(f"{op} needs a field path, not a list item")
+        return
+
+    if not isinstance(template, dict) or last not in template:
+        raise KeyError(f"unknown field {last!r}")
+    field_template = template[last]
+
+    if op == "append":
+        if not isinstance(field_template, list):
+            raise TypeError("append needs a list path")
+        target, _ = _patch_step(parent, template, last)
+        item_template = field_template[0] if field_template else ""
+        if isinstance(item_template, dict):
+            fields = _patch_object_value(value, item_template)
+            # Reuse a trailing empty item (e.g. the blank entry from CV_SCHEMA)
+            if not target or not _is_blank(target[-1]):
+                target.append(_blank_value(item_template))
+            deep_update(target[-1], fields)
+        else:
+            value = _patch_text_value(value)
+            if value and value not in target:
+                target.append(value)
+    elif isinstance(field_template, (dict, list)):
+        raise TypeError(f"{op} needs a field path")
     else:
-        # Primitive (str, int, etc.) → overwrite
-        return new_data
+        parent[last] = _patch_text_value(value) if op == "set" else ""
+
+
+def apply_cv_patches(cv_dict, patches):
+    """Apply extraction patch operations to CV data in place.
+
+    Paths are field names joined by CV_PATCH_PATH_SEPARATOR, with list
+    indexes as numbers (negative counts from the end, -1 is the last item).
+
+    Operations:
+        set: Set the text field at path to value.
+        append: Append to the list at path. Lists of objects get a new item
+            filled from value if it is an object (or JSON object text), else
+            an empty item to fill with following "set" operations (a trailing
+            empty item is reused). Lists of strings get value, unless
+            already present.
+        remove: Remove the list item at path, or clear the text field at path.
+
+    Values must fit the field: text for text fields and string lists (numbers
+    are converted), an object for lists of objects. Invalid patches are
+    skipped, the rest are still applied.
+
+    Args:
+        cv_dict: CV data dictionary to update
+        patches: List of {"op", "path", "value"} dicts
+
+    Returns:
+        list[str]: Errors for skipped patches
+    """
+    errors = []
+    for patch in patches:
+        try:
+            _apply_patch(cv_dict, patch)
+        except (KeyError, IndexError, TypeError, ValueError, AttributeError) as e:
+            errors.append(f"{patch}: {e}")
+    return errors
+
+
+def parse_cv_patches(json_str):
+    """Parse LLM patch output into a list of patch operations.
+
+    Accepts {"patches": [...]} or a bare list, and repairs truncated output.
+
+    Args:
+        json_str: JSON string from the LLM
+
+    Returns:
+        list: Patch dicts (empty if nothing usable could be parsed)
+    """
+    try:
+        data = json.loads(json_str)
+    except json.JSONDecodeError:
+        try:
+            data = json.loads(repair_truncated_json(json_str))
+        except json.JSONDecodeError as e:
+            log_error("cv_patch_json_decode_failed", str(e), {"length": len(json_str)})
+            return []
+
+    if isinstance(data, dict):
+        data = data.get("patches", [])
+    if not isinstance(data, list):
+        return []
+    # Repairing a cut-off patch can leave an empty object behind
+    return [patch for patch in data if isinstance(patch, dict) and patch]
+
+
+def save_patch_str_to_dict(session_state, patch_str):
+    """Applies LLM patch output to the dictionary storing CV data.
+
+    Args:
+        session_state: Streamlit session state
+        patch_str: JSON string with patch operations from LLM
+    """
+    if "CV_dict" not in session_state:
+        session_state.CV_dict = copy.deepcopy(CV_SCHEMA)
+
+    errors = apply_cv_patches(session_state.CV_dict, parse_cv_patches(patch_str))
+    if errors:
+        log_error("cv_patches_skipped", "; ".join(errors[:10]), {"error_count": len(errors)})
 
 
 def save_json_str_to_dict(session_state, json_str):
@@ -70,20 +547,18 @@ def save_json_str_to_dict(session_state, json_str):
         json_str: JSON string from LLM
     """
     if "CV_dict" not in session_state:
-        session_state.CV_dict = CV_SCHEMA.copy()
+        session_state.CV_dict = copy.deepcopy(CV_SCHEMA)
 
-    try:
-        data_dict = json.loads(json_str)
+    data_dict = parse_cv_json(json_str)
+    if data_dict:
         session_state.CV_dict = deep_update(session_state.CV_dict, data_dict)
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON: {e}")
 
 
-def extract_personalia_from_json(json_str):
-    """Extracts name and date of birth from JSON string.
+def extract_personalia(cv_dict):
+    """Extracts name and date of birth from CV data.
 
     Args:
-        json_str: JSON string containing personalia
+        cv_dict: CV data dictionary
 
     Returns:
         tuple: (name, date_of_birth)
@@ -91,9 +566,9 @@ def extract_personalia_from_json(json_str):
     Raises:
         ValueError: If name or DOB is empty
     """
-    personalia_dict = json.loads(json_str)
-    name = personalia_dict["Personalia"]["Navn"]
-    dob = personalia_dict["Personalia"]["Fødselsdato"]
+    personalia = cv_dict.get("Personalia", {})
+    name = personalia.get("Navn", "")
+    dob = personalia.get("Fødselsdato", "")
 
     # If name and dob not given, or empty, raise error
     if name == "" or dob == "":
@@ -199,7 +674,7 @@ def extract_cv_from_pdf(client, uploaded_file):
     Returns:
         dict: Extracted CV data in JSON format, or None if extraction fails
     """
-    from src.config import MODEL
+    from src.config import MODEL, EXTRACTION_MODE
 
     # Extract text from PDF
     pdf_text = ""
@@ -215,18 +690,15 @@ def extract_cv_from_pdf(client, uploaded_file):
         {json.dumps(CV_SCHEMA, indent=2, ensure_ascii=False)}
         """)
 
+    extra_args = {"response_format": CV_RESPONSE_FORMAT} if EXTRACTION_MODE == "structured" else {}
     response = client.chat.completions.create(
         model=MODEL,
         messages=[
             {"role": "system", "content": "You are a CV data extractor."},
             {"role": "user", "content": extraction_prompt}
         ],
+        **extra_args,
     )
+    record_token_usage("cv_pdf_import", response.usage)
 
-    try:
-        json_data = response.choices[0].message.content
-        cv_dict = json.loads(json_data)
-        return cv_dict
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON from PDF extraction: {e}")
-        return None
+    return parse_cv_json(response.choices[0].message.content)
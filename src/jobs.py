@@ -0,0 +1,136 @@
+"""Background jobs with stage progress, shared by all sessions.
+
+Jobs run on their own thread pool so a job can still submit work to the
+shared llm_client executor without risking a deadlock. Workers only update
+their Job object; the Streamlit script polls it by job ID.
+"""
+
+import contextvars
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from src.config import JOB_MAX_WORKERS, JOB_RETENTION
+
+job_executor = ThreadPoolExecutor(max_workers=JOB_MAX_WORKERS, thread_name_prefix="job")
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+class Job:
+    """A background job reporting progress through named stages.
+
+    Args:
+        job_id: Unique job ID
+        stages: Names of the stages in the order they normally run
+    """
+
+    def __init__(self, job_id, stages):
+        self.id = job_id
+        self.stages = tuple(stages)
+        self.future = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._running = []
+        self._completed = set()
+        self._lock = threading.Lock()
+
+    def report(self, stage, done=False):
+        """Mark a stage as started, or as done. Called from the worker thread.
+
+        Args:
+            stage: Stage name
+            done: True when the stage has finished
+        """
+        with self._lock:
+            if done:
+                self._completed.add(stage)
+                if stage in self._running:
+                    self._running.remove(stage)
+            elif stage not in self._running:
+                self._running.append(stage)
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    def result(self):
+        """Return the job's result, raising its exception if it failed."""
+        return self.future.result()
+
+    def progress(self):
+        """Get the current progress of the job.
+
+        Returns:
+            dict: Running and completed stages, fraction done and elapsed seconds
+        """
+        with self._lock:
+            completed = [s for s in self.stages if s in self._completed]
+            running = list(self._running)
+        end = self.finished_at or time.time()
+        return {
+            "running": running,
+            "completed": completed,
+            "fraction": 1.0 if self.done() else len(completed) / len(self.stages) if self.stages else 0.0,
+            "elapsed": end - self.created_at,
+        }
+
+
+def _run(job, fn, args):
+    try:
+        return fn(*args, progress=job.report)
+    finally:
+        job.finished_at = time.time()
+
+
+def _prune_jobs():
+    """Forget finished jobs older than JOB_RETENTION (caller holds _jobs_lock)."""
+    cutoff = time.time() - JOB_RETENTION
+    for job_id in [j.id for j in _jobs.values() if j.finished_at is not None and j.finished_at < cutoff]:
+        del _jobs[job_id]
+
+
+def submit_job(fn, *args, stages=()):
+    """Run fn(*args, progress=callback) in the background.
+
+    fn reports progress by calling progress(stage) when a stage starts and
+    progress(stage, done=True) when it finishes.
+
+    Args:
+        fn: Function to run
+        *args: Positional arguments for fn
+        stages: Names of the stages fn reports
+
+    Returns:
+        str: Job ID to pass to get_job
+    """
+    job = Job(uuid.uuid4().hex, stages)
+    with _jobs_lock:
+        _prune_jobs()
+        _jobs[job.id] = job
+    # Run in a copy of the caller's context so tracing spans and session
+    # token usage (src.metrics) carry over
+    job.future = job_executor.submit(contextvars.copy_context().run, _run, job, fn, args)
+    return job.id
+
+
+def get_job(job_id):
+    """Look up a job by ID.
+
+    Returns:
+        Job: The job, or None if it is unknown or has been pruned
+    """
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def get_job_stats():
+    """Get counts of running and finished jobs.
+
+    Returns:
+        dict: Number of running and finished (retained) jobs
+    """
+    with _jobs_lock:
+        running = sum(1 for job in _jobs.values() if not job.done())
+        return {"running": running, "finished": len(_jobs) - running, "max_workers": JOB_MAX_WORKERS}
@@ -1,10 +1,35 @@
 """LLM interaction functions for the CV Generator."""
 
+import hashlib
+import json
+import re
+import threading
 from concurrent.futures import ThreadPoolExecutor
 from collections import namedtuple
-from openai import OpenAI
 
-from src.config import MODEL, HISTORY_LENGTH, SUMMARIZE_OLD_HISTORY
+import httpx
+from openai import OpenAI, DefaultHttpxClient
+
+from src.config import (
+    MODEL,
+    HISTORY_LENGTH,
+    SUMMARIZE_OLD_HISTORY,
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    OPENAI_KEEPALIVE_EXPIRY,
+    OPENAI_CONNECT_TIMEOUT,
+    OPENAI_READ_TIMEOUT,
+    OPENAI_MAX_RETRIES,
+    PROMPT_TOKEN_BUDGET,
+    PROMPT_SECTION_BUDGETS,
+    SUGGESTION_CACHE_SIZE,
+    SUGGESTION_CACHE_TTL,
+    SUGGESTION_VARIATION_POOL_SIZE,
+    EXTRACTION_FORMAT,
+)
+from src.cache import LRUCache
+from src.metrics import start_span, current_span, traced, record_token_usage, log_error
+from src.prompt_budget import PromptSection, estimate_tokens, compact_cv_data, fit_sections
 
 
 # Thread pool for parallel tasks
@@ -14,10 +39,111 @@ executor = ThreadPoolExecutor(max_workers=5)
 TaskInfo = namedtuple("TaskInfo", ["name", "function", "args"])
 TaskResult = namedtuple("TaskResult", ["name", "result"])
 
+# Process-wide OpenAI client, shared by every session and script rerun
+_client_lock = threading.Lock()
+_shared_client = None
+_shared_http_client = None
+_shared_api_key = None
+_pool_counters = {"clients_created": 0, "requests": 0, "responses": 0}
+
+# Suggestions keyed by normalized question line + digest of the relevant CV fields
+suggestion_cache = LRUCache(maxsize=SUGGESTION_CACHE_SIZE, ttl=SUGGESTION_CACHE_TTL)
+
+# Separator between suggestion sets in a variation pool response
+SUGGESTION_SET_SEPARATOR = "---"
+
+# Free-text, contact and identity fields that don't change which suggestions
+# fit a profile. They are left out of the suggestion prompt too, so cached
+# suggestions can be shared between users without leaking them.
+_SUGGESTION_IGNORED_FIELDS = {
+    "Beskrivelse", "Ytterligere_informasjon", "Begrunnelse",
+    "Navn", "Fødselsdato", "Adresse", "Epost", "Telefonnummer",
+}
+
+
+def _count_request(request):
+    """httpx event hook: count outgoing requests."""
+    with _client_lock:
+        _pool_counters["requests"] += 1
+
+
+def _count_response(response):
+    """httpx event hook: count responses (headers received)."""
+    with _client_lock:
+        _pool_counters["responses"] += 1
+
+
+def _build_http_client():
+    """Build the keep-alive HTTP client used by the shared OpenAI client."""
+    return DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(OPENAI_READ_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+        event_hooks={"request": [_count_request], "response": [_count_response]},
+    )
+
 
 def get_openai_client(api_key):
-    """Initialize and return OpenAI client."""
-    return OpenAI(api_key=api_key)
+    """Return the process-wide OpenAI client, creating it on first use.
+
+    All sessions share one client and therefore one pool of keep-alive
+    connections, so reruns don't pay connection and TLS setup again.
+    A new client is only built if the API key changes; the previous one is
+    closed so its connection pool doesn't leak.
+    """
+    global _shared_client, _shared_http_client, _shared_api_key
+
+    with _client_lock:
+        if _shared_client is None or _shared_api_key != api_key:
+            if _shared_client is not None:
+                _shared_client.close()
+            _shared_http_client = _build_http_client()
+            _shared_client = OpenAI(
+                api_key=api_key,
+                http_client=_shared_http_client,
+                max_retries=OPENAI_MAX_RETRIES,
+            )
+            _shared_api_key = api_key
+            _pool_counters["clients_created"] += 1
+        return _shared_client
+
+
+def get_client_pool_stats():
+    """Get usage statistics for the shared client's connection pool.
+
+    Returns:
+        dict: Request counters, pool limits and open/idle connection counts
+    """
+    with _client_lock:
+        stats = dict(_pool_counters)
+        http_client = _shared_http_client
+
+    stats["in_flight"] = stats["requests"] - stats["responses"]
+    stats["max_connections"] = OPENAI_MAX_CONNECTIONS
+    stats["max_keepalive_connections"] = OPENAI_MAX_KEEPALIVE_CONNECTIONS
+
+    stats.update(_connection_stats(http_client))
+    return stats
+
+
+def _connection_stats(http_client):
+    """Count open and idle connections of an httpx client's pool.
+
+    httpx/httpcore don't expose a public stats API, so this reads private
+    attributes and returns {} if they are not there.
+    """
+    pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None)
+    if connections is None:
+        return {}
+    connections = list(connections)
+    return {
+        "open_connections": len(connections),
+        "idle_connections": sum(1 for c in connections if getattr(c, "is_idle", lambda: False)()),
+    }
 
 
 def build_prompt(**kwargs):
@@ -55,19 +181,32 @@ def history_to_text(chat_history):
     return "\n".join(f"[{h['role']}]: {h['content']}" for h in chat_history)
 
 
-def generate_chat_summary(client, messages):
+def generate_chat_summary(client, messages, previous_summary=None):
     """
     Summarize a conversation history using the OpenAI API.
 
+    When a previous summary is given, only the new messages are sent and
+    folded into it, so the summary can be updated incrementally.
+
     Args:
         client: OpenAI client instance
         messages (list[dict]): Chat history with {"role": "user"|"assistant", "content": str}
+        previous_summary (str): Summary of the conversation before these messages (optional)
 
     Returns:
         str: A concise summary of the conversation
     """
+    if previous_summary:
+        instructions = (
+            "Update the summary of this conversation with the new messages. "
+            "Keep all facts about the user. Be as concise as possible."
+        )
+    else:
+        instructions = "Summarize this conversation as concisely as possible."
+
     prompt = build_prompt(
-        instructions="Summarize this conversation as concisely as possible.",
+        instructions=instructions,
+        summary=previous_summary,
         conversation=history_to_text(messages),
     )
 
@@ -78,12 +217,18 @@ def generate_chat_summary(client, messages):
             {"role": "user", "content": prompt}
         ]
     )
+    record_token_usage("history_summary", response.usage)
     return response.choices[0].message.content
 
 
+@traced()
 def build_question_prompt(messages, question, json_generator=False):
     """Fetches info from different services and creates the prompt string.
 
+    Every section is fitted into PROMPT_SECTION_BUDGETS and the whole prompt
+    into PROMPT_TOKEN_BUDGET, trimming the lowest priority sections first. The
+    estimated token counts are stored in session state under "prompt_tokens".
+
     Args:
         messages: Session state messages list
         question: Current user question
@@ -92,57 +237,131 @@ def build_question_prompt(messages, question, json_generator=False):
     Returns:
         str: Formatted prompt for the LLM
     """
-    from src.prompts import get_instructions, INSTRUCTIONS_GENERATE_DATA_FROM_RESPONSE
+    # Import here to avoid circular dependency
+    import streamlit as st
+    from src.prompts import (
+        get_instructions,
+        INSTRUCTIONS_GENERATE_DATA_FROM_RESPONSE,
+        INSTRUCTIONS_GENERATE_PATCHES_FROM_RESPONSE,
+    )
 
     old_history = messages[:-HISTORY_LENGTH] if len(messages) > HISTORY_LENGTH else []
     recent_history = messages[-HISTORY_LENGTH:] if len(messages) > 0 else []
 
     recent_history_str = history_to_text(recent_history) if recent_history else None
 
-    # Fetch information from different services in parallel
-    task_infos = []
-
-    if SUMMARIZE_OLD_HISTORY and old_history:
-        # Note: This would need the client, but we'll skip for now to avoid circular dependencies
-        pass
+    summary = None
+    if SUMMARIZE_OLD_HISTORY and old_history and not json_generator:
+        # Rolling summary of messages outside the window, updated in the background
+        # (see session_helpers.start_history_summary_update)
+        summary = st.session_state.get("history_summary", {}).get("text")
+
+    # Sections in increasing priority, lowest are trimmed first
+    sections = [
+        PromptSection("conversation_summary", summary, 1, PROMPT_SECTION_BUDGETS["conversation_summary"], None, "head"),
+        PromptSection("recent_messages", recent_history_str, 2, PROMPT_SECTION_BUDGETS["recent_messages"], None, "tail"),
+        PromptSection("question", question, 5, PROMPT_SECTION_BUDGETS["question"], None, "head"),
+    ]
+    if json_generator:
+        if EXTRACTION_FORMAT == "patches":
+            instructions_template = INSTRUCTIONS_GENERATE_PATCHES_FROM_RESPONSE
+            # Patch paths address list items by index, so the model needs the
+            # current data with every entry in its place
+            cv_dict = st.session_state.get("CV_dict", {})
+            sections.append(PromptSection(
+                "cv_data", compact_cv_data(cv_dict, keep_indexes=True), 4, PROMPT_SECTION_BUDGETS["cv_data"], None, "head"
+            ))
+        else:
+            instructions_template = INSTRUCTIONS_GENERATE_DATA_FROM_RESPONSE
+    else:
+        cv_dict = st.session_state.get("CV_dict", {})
+        user_message = str(st.session_state.get("user_message", {}))
+        sections += [
+            PromptSection("user_message", user_message, 3, PROMPT_SECTION_BUDGETS["user_message"], None, "head"),
+            PromptSection("cv_data", str(cv_dict), 4, PROMPT_SECTION_BUDGETS["cv_data"], lambda: compact_cv_data(cv_dict), "head"),
+        ]
+        instructions_template = get_instructions(st.session_state, cv_data="", user_message="")
 
-    context = {}
+    fitted = fit_sections(sections, PROMPT_TOKEN_BUDGET, reserved_tokens=estimate_tokens(instructions_template))
 
-    # Import here to avoid circular dependency
-    import streamlit as st
-    instructions = INSTRUCTIONS_GENERATE_DATA_FROM_RESPONSE if json_generator else get_instructions(st.session_state)
+    if json_generator:
+        instructions = instructions_template
+    else:
+        instructions = get_instructions(st.session_state, cv_data=fitted["cv_data"], user_message=fitted["user_message"])
 
-    return build_prompt(
+    prompt = build_prompt(
         instructions=instructions,
-        **context,
-        recent_messages=recent_history_str,
-        question=question,
+        cv_data=fitted.get("cv_data") if json_generator else None,
+        conversation_summary=fitted["conversation_summary"],
+        recent_messages=fitted["recent_messages"],
+        question=fitted["question"],
     )
 
+    # Report estimated token counts per section for this call
+    report = {name: estimate_tokens(text) for name, text in fitted.items()}
+    report["instructions"] = estimate_tokens(instructions)
+    report["total"] = estimate_tokens(prompt)
+    prompt_tokens = st.session_state.get("prompt_tokens", {})
+    prompt_tokens["json" if json_generator else "chat"] = report
+    st.session_state.prompt_tokens = prompt_tokens
 
-def get_response(client, prompt):
+    return prompt
+
+
+def get_response(client, prompt, response_format=None, task="chat"):
     """
     Stream a response from the OpenAI API for a given prompt.
 
+    Token usage is requested with the stream and recorded under task (see
+    metrics.record_token_usage).
+
     Args:
         client: OpenAI client instance
         prompt (str): The user prompt or full conversation context
+        response_format (dict): Optional response format, e.g. schemas.CV_RESPONSE_FORMAT
+        task (str): Task type the token usage is recorded under
 
     Yields:
         str: Chunks of the model's generated text streamed as they arrive
     """
-    stream = client.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": prompt},
-        ],
-        stream=True,
-    )
-    for chunk in stream:
-        content = getattr(chunk.choices[0].delta, "content", None)
-        if content:
-            yield content
+    # The caller consumes the stream, so the span can't be a with-block around it
+    span = start_span("get_response", task=task)
+    completion = []
+    usage = None
+    try:
+        extra_args = {"response_format": response_format} if response_format else {}
+        stream = client.chat.completions.create(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": prompt},
+            ],
+            stream=True,
+            stream_options={"include_usage": True},
+            **extra_args,
+        )
+        for chunk in stream:
+            # The last chunk carries the usage and no choices
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            content = getattr(chunk.choices[0].delta, "content", None)
+            if content:
+                if not completion:
+                    span.set(ttft=span.elapsed())
+                completion.append(content)
+                yield content
+    except Exception as e:
+        span.set(error=type(e).__name__)
+        raise
+    finally:
+        if usage is not None:
+            record_token_usage(task, usage, span)
+        else:
+            # Stream closed early or the API sent no usage, keep an estimate on the span
+            span.set(prompt_tokens=estimate_tokens(prompt), completion_tokens=estimate_tokens("".join(completion)))
+        span.end()
 
 
 def generator_to_string(gen):
@@ -150,32 +369,85 @@ def generator_to_string(gen):
     return "".join(chunk for chunk in gen if isinstance(chunk, str))
 
 
-def generate_adaptive_suggestions(client, question, user_data, request_variation=False):
+def extract_question(text):
+    """Get the question line of an assistant message.
+
+    Args:
+        text: Assistant message text
+
+    Returns:
+        str: First line ending with "?" (markdown emphasis aside), or the whole text if there is none
     """
-    Generate context-aware suggestions based on question type and user's CV data.
+    for line in text.split("\n"):
+        if line.rstrip().rstrip("*_`").endswith("?"):
+            return line.strip()
+    return text.strip()
+
+
+def suggestion_profile(user_data):
+    """Get the CV fields that decide which suggestions fit (see _SUGGESTION_IGNORED_FIELDS).
 
     Args:
-        client: OpenAI client instance
-        question: The question the assistant just asked
         user_data: Dictionary containing user's CV data so far
-        request_variation: If True, generate alternative/different suggestions
 
     Returns:
-        str: Adaptive suggestions in markdown format, or None if no suggestions needed
+        dict: CV data without ignored and empty fields
     """
-    import json
+    def relevant(value):
+        if isinstance(value, dict):
+            return {k: relevant(v) for k, v in value.items() if k not in _SUGGESTION_IGNORED_FIELDS and v}
+        if isinstance(value, list):
+            return [relevant(v) for v in value if v]
+        return value
 
-    variation_instruction = ""
-    if request_variation:
-        variation_instruction = "\n\n**VIKTIG: Generer ALTERNATIVE og FORSKJELLIGE forslag fra tidligere. Vær kreativ og kom med nye ideer som brukeren kanskje ikke har tenkt på. Unngå å gjenta eksempler som har blitt vist før.**\n"
+    return relevant(user_data or {})
+
+
+def suggestion_cache_key(question, user_data):
+    """Build the suggestion cache key for a question and CV data.
+
+    Args:
+        question: The question the assistant asked (or the whole message)
+        user_data: Dictionary containing user's CV data so far
+
+    Returns:
+        tuple: (normalized question line, digest of the relevant CV fields)
+    """
+    normalized_question = " ".join(re.sub(r"[*_#`>]", "", extract_question(question)).lower().split())
+    profile = json.dumps(suggestion_profile(user_data), ensure_ascii=False, sort_keys=True)
+    return normalized_question, hashlib.sha256(profile.encode("utf-8")).hexdigest()
+
+
+def get_cached_suggestions(question, user_data):
+    """Look up cached suggestions without calling the LLM.
+
+    Args:
+        question: The question the assistant asked
+        user_data: Dictionary containing user's CV data so far
 
-    prompt = f"""
+    Returns:
+        tuple: (suggestions,) on a cache hit (suggestions may be None), else None
+    """
+    return suggestion_cache.get(suggestion_cache_key(question, user_data))
+
+
+def get_suggestion_cache_stats():
+    """Get hit/miss counters for the suggestion cache."""
+    return suggestion_cache.stats()
+
+
+VARIATION_INSTRUCTION = "\n\n**VIKTIG: Generer ALTERNATIVE og FORSKJELLIGE forslag fra tidligere. Vær kreativ og kom med nye ideer som brukeren kanskje ikke har tenkt på. Unngå å gjenta eksempler som har blitt vist før.**\n"
+
+
+def _suggestion_prompt(question, user_data, variation_instruction=""):
+    """Build the prompt for adaptive suggestions."""
+    return f"""
 Du er en intelligent CV-assistent som tilpasser forslag basert på spørsmålstype og brukerens profil.
 
 Spørsmål assistenten stilte: {question}
 
 Brukerens CV-data så langt:
-{json.dumps(user_data, ensure_ascii=False, indent=2)}
+{json.dumps(suggestion_profile(user_data), ensure_ascii=False, indent=2)}
 {variation_instruction}
 Analyser spørsmålet og generer passende forslag basert på disse retningslinjene:
 
@@ -212,6 +484,41 @@ Analyser spørsmålet og generer passende forslag basert på disse retningslinje
 Kun returner forslagslisten.
 """
 
+
+@traced()
+def generate_adaptive_suggestions(client, question, user_data, request_variation=False, lookup=True):
+    """
+    Generate context-aware suggestions based on question type and user's CV data.
+
+    Results are cached per normalized question line and CV profile (see
+    suggestion_cache_key). Variation requests always bypass the cache.
+
+    Args:
+        client: OpenAI client instance
+        question: The question the assistant just asked
+        user_data: Dictionary containing user's CV data so far
+        request_variation: If True, generate alternative/different suggestions
+        lookup: If False, skip the cache lookup (the caller already missed with
+            get_cached_suggestions) but still cache the result
+
+    Returns:
+        str: Adaptive suggestions in markdown format, or None if no suggestions needed
+    """
+    cache_key = None
+    if not request_variation:
+        cache_key = suggestion_cache_key(question, user_data)
+        # Cached values are (suggestions,) so a cached None is a hit too
+        cached = suggestion_cache.get(cache_key) if lookup else None
+        current_span().set(cache_hit=cached is not None)
+        if cached is not None:
+            return cached[0]
+
+    variation_instruction = ""
+    if request_variation:
+        variation_instruction = VARIATION_INSTRUCTION
+
+    prompt = _suggestion_prompt(question, user_data, variation_instruction)
+
     try:
         # Use higher temperature for variation to get more diverse suggestions
         temperature = 1.0 if request_variation else 0.7
@@ -225,14 +532,64 @@ Kun returner forslagslisten.
             temperature=temperature,
         )
 
+        record_token_usage("suggestions", response.usage)
         suggestions = response.choices[0].message.content.strip()
 
         # Don't return suggestions if the LLM says they're not needed
         if suggestions.upper() == "NONE" or len(suggestions) < 10:
-            return None
+            suggestions = None
+
+        if cache_key is not None:
+            suggestion_cache.set(cache_key, (suggestions,))
 
         return suggestions
 
     except Exception as e:
-        print(f"Error generating suggestions: {e}")
+        log_error("suggestions_failed", str(e))
         return None
+
+
+def generate_suggestion_variations(client, question, user_data, count=SUGGESTION_VARIATION_POOL_SIZE):
+    """
+    Generate a pool of distinct suggestion sets with a single LLM call.
+
+    Used to serve "Regenerer forslag" clicks without a round-trip per click.
+
+    Args:
+        client: OpenAI client instance
+        question: The question the assistant just asked
+        user_data: Dictionary containing user's CV data so far
+        count: Number of suggestion sets to request
+
+    Returns:
+        list[str]: Suggestion sets in markdown format (may be empty)
+    """
+    pool_instruction = (
+        VARIATION_INSTRUCTION
+        + f"\n**Generer {count} ulike sett med forslag. Hvert sett skal være forskjellig fra de andre. "
+        + f"Skill settene med en linje som kun inneholder {SUGGESTION_SET_SEPARATOR}**\n"
+    )
+    prompt = _suggestion_prompt(question, user_data, pool_instruction)
+
+    try:
+        response = client.chat.completions.create(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": "You are an intelligent CV suggestion assistant that adapts to question context."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=1.0,
+        )
+        record_token_usage("suggestion_variations", response.usage)
+        content = response.choices[0].message.content
+
+    except Exception as e:
+        log_error("suggestion_variations_failed", str(e))
+        return []
+
+    variations = []
+    for block in re.split(rf"^\s*{re.escape(SUGGESTION_SET_SEPARATOR)}\s*$", content, flags=re.MULTILINE):
+        block = block.strip()
+        if block.upper() != "NONE" and len(block) >= 10 and block not in variations:
+            variations.append(block)
+    return variations
@@ -1,10 +1,43 @@
 """Metrics and observability module for CV Generator."""
 
+import atexit
+import contextvars
 import datetime
+import functools
+import os
+import queue
+import random
+import sys
+import threading
+import time
 import uuid
 import json
-from typing import Optional, Dict, Any
+from collections import OrderedDict, deque, namedtuple
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Tuple
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from src.config import (
+    EVENT_QUEUE_SIZE,
+    EVENT_BATCH_SIZE,
+    EVENT_FLUSH_INTERVAL,
+    EVENT_SAMPLE_THRESHOLD,
+    EVENT_SAMPLE_RATE,
+    METRICS_SINK,
+    METRICS_SPOOL_PATH,
+    METRICS_LOCAL_SINK_PATH,
+    METRICS_UPLOAD_INTERVAL,
+    METRICS_UPLOAD_BATCH_SIZE,
+    METRICS_UPLOAD_MAX_BACKOFF,
+    METRICS_MAX_EVENTS,
+    METRICS_MAX_ERRORS,
+    METRICS_MAX_RESPONSE_TIMES,
+    METRICS_MAX_TURN_TRACES,
+    TRACE_MAX_TRACES,
+    TRACE_EXPORT_PATH,
+)
+from src.metrics_store import MetricsSpool, MetricsUploader, SupabaseSink, LocalSink
 
 # Lazy imports to avoid requiring these packages if not configured
 def get_supabase_client():
@@ -21,18 +54,207 @@ def get_supabase_client():
     return None
 
 
+_posthog_lock = threading.Lock()
+_posthog_state = {"resolved": False, "client": None}
+
+
 def get_posthog_client():
-    """Get PostHog client with lazy import."""
+    """Get PostHog client with lazy import, configured once per process."""
+    error = None
+    with _posthog_lock:
+        if not _posthog_state["resolved"]:
+            _posthog_state["resolved"] = True
+            try:
+                import posthog
+                if "POSTHOG_KEY" in st.secrets:
+                    # PostHog 3.0+ uses api_key instead of project_api_key
+                    posthog.api_key = st.secrets["POSTHOG_KEY"]
+                    posthog.host = st.secrets.get("POSTHOG_HOST", "https://app.posthog.com")
+                    _posthog_state["client"] = posthog
+            except Exception as e:
+                error = e
+        client = _posthog_state["client"]
+
+    # Outside the lock, log_error comes back here through log_event
+    if error is not None:
+        log_error("posthog_not_configured", str(error))
+    return client
+
+
+# Process-wide queue of (distinct_id, event, properties) sent to PostHog in
+# batches by a background thread, so analytics stay off the script thread
+_event_queue: "queue.Queue[Tuple[str, str, Dict[str, Any]]]" = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+_event_lock = threading.Lock()
+_event_flusher: Optional[threading.Thread] = None
+_event_stats = {"enqueued": 0, "flushed": 0, "batches": 0, "failed": 0, "dropped": 0, "sampled_out": 0}
+
+# Events that are never sampled out (they are still dropped if the queue is full)
+_UNSAMPLED_EVENTS = {"error_occurred", "session_started", "cv_generated_success"}
+
+
+def _send_events(batch: List[Tuple[str, str, Dict[str, Any]]]):
+    """Send a batch of events to PostHog."""
+    posthog = get_posthog_client()
     try:
-        import posthog
-        if "POSTHOG_KEY" in st.secrets:
-            # PostHog 3.0+ uses api_key instead of project_api_key
-            posthog.api_key = st.secrets["POSTHOG_KEY"]
-            posthog.host = st.secrets.get("POSTHOG_HOST", "https://app.posthog.com")
-            return posthog
+        for distinct_id, event_name, properties in batch:
+            posthog.capture(distinct_id=distinct_id, event=event_name, properties=properties)
+        posthog.flush()
     except Exception as e:
-        print(f"PostHog not configured: {e}")
-    return None
+        # Runs on the flusher thread, so this is only counted process-wide
+        log_error("posthog_flush_failed", str(e), {"events": len(batch)})
+        with _event_lock:
+            _event_stats["failed"] += len(batch)
+        return
+
+    with _event_lock:
+        _event_stats["flushed"] += len(batch)
+        _event_stats["batches"] += 1
+
+
+def _flush_events_forever():
+    """Send queued events in batches of EVENT_BATCH_SIZE or every EVENT_FLUSH_INTERVAL seconds."""
+    while True:
+        batch = [_event_queue.get()]
+        deadline = time.monotonic() + EVENT_FLUSH_INTERVAL
+        while len(batch) < EVENT_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_event_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        _send_events(batch)
+
+
+def _flush_remaining_events():
+    """Send whatever is still queued (at interpreter exit)."""
+    batch = []
+    while True:
+        try:
+            batch.append(_event_queue.get_nowait())
+        except queue.Empty:
+            break
+    if batch:
+        _send_events(batch)
+
+
+def _enqueue_event(distinct_id: str, event_name: str, properties: Dict[str, Any]):
+    """Queue an event for the background flusher, sampling or dropping it under load."""
+    global _event_flusher
+
+    with _event_lock:
+        if _event_flusher is None:
+            _event_flusher = threading.Thread(target=_flush_events_forever, name="event-flusher", daemon=True)
+            _event_flusher.start()
+            atexit.register(_flush_remaining_events)
+
+        # Above the threshold, keep only a sample of the routine events
+        if (
+            _event_queue.qsize() >= EVENT_SAMPLE_THRESHOLD * EVENT_QUEUE_SIZE
+            and event_name not in _UNSAMPLED_EVENTS
+            and random.random() >= EVENT_SAMPLE_RATE
+        ):
+            _event_stats["sampled_out"] += 1
+            return
+
+        try:
+            _event_queue.put_nowait((distinct_id, event_name, properties))
+            _event_stats["enqueued"] += 1
+        except queue.Full:
+            _event_stats["dropped"] += 1
+
+
+def get_event_pipeline_stats() -> Dict[str, Any]:
+    """Get counters of the PostHog event pipeline."""
+    with _event_lock:
+        stats = dict(_event_stats)
+    stats["queued"] = _event_queue.qsize()
+    stats["posthog_configured"] = get_posthog_client() is not None
+    return stats
+
+
+# Compact records for the per-session event and error buffers (timestamp is epoch seconds)
+EventRecord = namedtuple("EventRecord", ["timestamp", "event", "properties"])
+ErrorRecord = namedtuple("ErrorRecord", ["timestamp", "type", "message", "context"])
+
+# Events that mark the CV as downloaded
+_DOWNLOAD_EVENTS = {"cv_pdf_downloaded", "cv_docx_downloaded"}
+
+
+class RingBuffer:
+    """Fixed-capacity buffer keeping the most recent items. Safe to use from any thread.
+
+    Worker threads append to the session buffers while the script thread
+    reads them, so readers iterate over a snapshot taken under the lock.
+
+    Args:
+        capacity: Max number of items kept; older items are discarded
+    """
+
+    __slots__ = ("_items", "_total", "_lock")
+
+    def __init__(self, capacity: int):
+        self._items = deque(maxlen=capacity)
+        self._total = 0  # items ever appended, including discarded ones
+        self._lock = threading.Lock()
+
+    def append(self, item):
+        with self._lock:
+            self._items.append(item)
+            self._total += 1
+
+    def snapshot(self) -> List[Any]:
+        """Get the kept items, oldest first."""
+        with self._lock:
+            return list(self._items)
+
+    @property
+    def total(self) -> int:
+        with self._lock:
+            return self._total
+
+    @property
+    def dropped(self) -> int:
+        with self._lock:
+            return self._total - len(self._items)
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+
+def _record_to_dict(record) -> Dict[str, Any]:
+    """Convert an EventRecord/ErrorRecord to a JSON-serializable dict."""
+    data = record._asdict()
+    data["timestamp"] = datetime.datetime.fromtimestamp(record.timestamp).isoformat()
+    return data
+
+
+# Session metrics of the script run a worker thread was started from (see
+# submit_traced), so log_event/log_error work outside the script thread
+_session_metrics: contextvars.ContextVar = contextvars.ContextVar("session_metrics", default=None)
+
+# Error counts of all sessions, including errors of work not tied to a session
+_process_errors_lock = threading.Lock()
+_process_errors: Dict[str, Dict[str, Any]] = {}
+
+
+def _caller_metrics() -> Optional[Dict[str, Any]]:
+    """Get the session metrics of the caller.
+
+    Returns:
+        st.session_state.metrics in the script thread, the metrics bound to
+        the context in worker threads, or None if there is no session
+    """
+    if get_script_run_ctx(suppress_warning=True) is not None:
+        if "metrics" not in st.session_state:
+            initialize_session_metrics()
+        return st.session_state.metrics
+    return _session_metrics.get()
 
 
 def initialize_session_metrics():
@@ -43,15 +265,23 @@ def initialize_session_metrics():
             "session_start": datetime.datetime.now(),
             "first_user_input": None,
             "cv_generation_attempts": [],
-            "events": [],
-            "errors": [],
+            "events": RingBuffer(METRICS_MAX_EVENTS),
+            "errors": RingBuffer(METRICS_MAX_ERRORS),
+            "cv_downloaded": False,
             "total_tokens": 0,
-            "response_times": [],
+            "token_usage": TokenUsage(),
+            "response_times": RingBuffer(METRICS_MAX_RESPONSE_TIMES),
+            "turn_traces": RingBuffer(METRICS_MAX_TURN_TRACES),
             "stages_completed": [],
             "device_info": get_device_info(),
             "entry_source": "direct"  # Can be updated based on query params
         }
 
+    # Bind this session's metrics and token usage to the script thread, worker
+    # threads inherit them through submit_traced (see record_token_usage)
+    _session_metrics.set(st.session_state.metrics)
+    _session_token_usage.set(st.session_state.metrics["token_usage"])
+
 
 def get_device_info() -> Dict[str, str]:
     """Extract device information from user agent."""
@@ -71,59 +301,65 @@ def log_event(event_name: str, properties: Optional[Dict[str, Any]] = None):
     """
     Log an event to both local state and external services.
 
+    Safe to call from worker threads started with submit_traced. Events
+    without a session (e.g. from process-wide background work) are dropped.
+
     Args:
         event_name: Name of the event (e.g., 'cv_generated', 'error_occurred')
         properties: Additional event metadata
     """
-    if "metrics" not in st.session_state:
-        initialize_session_metrics()
+    metrics = _caller_metrics()
+    if metrics is None:
+        return
 
-    timestamp = datetime.datetime.now()
-    event = {
-        "timestamp": timestamp.isoformat(),
-        "event": event_name,
-        "properties": properties or {}
-    }
+    properties = properties or {}
 
     # Log to session state
-    st.session_state.metrics["events"].append(event)
+    metrics["events"].append(EventRecord(time.time(), event_name, properties))
+    if event_name in _DOWNLOAD_EVENTS:
+        metrics["cv_downloaded"] = True
 
-    # Log to PostHog
-    posthog = get_posthog_client()
-    if posthog:
-        try:
-            posthog.capture(
-                distinct_id=st.session_state.metrics["session_id"],
-                event=event_name,
-                properties={
-                    **event["properties"],
-                    "session_duration": get_session_duration(),
-                    "message_count": len(st.session_state.get("messages", []))
-                }
-            )
-        except Exception as e:
-            print(f"PostHog logging failed: {e}")
+    # Queue for PostHog (sent in the background)
+    if get_posthog_client():
+        properties = {
+            **properties,
+            "session_duration": (datetime.datetime.now() - metrics["session_start"]).total_seconds(),
+        }
+        # Worker threads can't read the messages from session state
+        if get_script_run_ctx(suppress_warning=True) is not None:
+            properties["message_count"] = len(st.session_state.get("messages", []))
+        _enqueue_event(metrics["session_id"], event_name, properties)
 
 
 def log_error(error_type: str, error_message: str, context: Optional[Dict] = None):
-    """Log an error with context."""
-    if "metrics" not in st.session_state:
-        initialize_session_metrics()
+    """Log an error with context.
 
-    error = {
-        "timestamp": datetime.datetime.now().isoformat(),
-        "type": error_type,
-        "message": error_message,
-        "context": context or {}
-    }
+    Counted for the whole process as well (see get_error_stats), so errors
+    of background work without a session are not lost.
+    """
+    with _process_errors_lock:
+        counts = _process_errors.setdefault(error_type, {"count": 0})
+        counts["count"] += 1
+        counts["last_message"] = error_message
+        counts["last_at"] = datetime.datetime.now().isoformat()
 
-    st.session_state.metrics["errors"].append(error)
+    metrics = _caller_metrics()
+    if metrics is None:
+        return
+
+    metrics["errors"].append(ErrorRecord(time.time(), error_type, error_message, context or {}))
     log_event("error_occurred", {
         "error_type": error_type,
         "error_message": error_message
     })
 
 
+def get_error_stats() -> Dict[str, Dict[str, Any]]:
+    """Get error counts and the last message per error type, for all sessions."""
+    with _process_errors_lock:
+        return {error_type: dict(counts) for error_type, counts in _process_errors.items()}
+
+
 def track_first_user_input():
     """Track the timestamp of the first user input."""
     if "metrics" not in st.session_state:
@@ -221,7 +457,7 @@ Returner BARE et JSON-objekt i dette formatet:
 """
 
     try:
-        response_gen = get_response(client, prompt)
+        response_gen = get_response(client, prompt, task="cv_quality_score")
         response = generator_to_string(response_gen)
 
         # Extract JSON from response
@@ -265,18 +501,65 @@ Returner BARE et JSON-objekt i dette formatet:
         }
 
 
+_metrics_store_lock = threading.Lock()
+_metrics_store = {"resolved": False, "uploader": None}
+
+
+def get_metrics_uploader() -> Optional[MetricsUploader]:
+    """Get the session metrics spool and uploader, created once per process.
+
+    Returns:
+        MetricsUploader, or None if no sink is configured
+    """
+    with _metrics_store_lock:
+        if not _metrics_store["resolved"]:
+            _metrics_store["resolved"] = True
+            if METRICS_SINK == "local":
+                sink = LocalSink(METRICS_LOCAL_SINK_PATH)
+            else:
+                supabase = get_supabase_client()
+                sink = SupabaseSink(supabase) if supabase else None
+
+            if sink is not None:
+                try:
+                    spool = MetricsSpool(METRICS_SPOOL_PATH, max_backoff=METRICS_UPLOAD_MAX_BACKOFF)
+                except Exception as e:
+                    log_error("metrics_spool_unavailable", str(e), {"path": METRICS_SPOOL_PATH})
+                else:
+                    uploader = MetricsUploader(
+                        spool, sink, interval=METRICS_UPLOAD_INTERVAL, batch_size=METRICS_UPLOAD_BATCH_SIZE,
+                        on_error=lambda e: log_error("metrics_upload_failed", f"{type(e).__name__}: {e}"),
+                    )
+                    uploader.start()
+                    _metrics_store["uploader"] = uploader
+        return _metrics_store["uploader"]
+
+
 def save_session_metrics():
-    """Save session metrics to Supabase at session end."""
+    """Spool session metrics for background upload.
+
+    Writes to the local spool only, so it is cheap enough to call on every
+    script run. Nothing is written if the metrics haven't changed since the
+    last call.
+    """
     if "metrics" not in st.session_state:
         return
 
-    supabase = get_supabase_client()
-    if not supabase:
+    uploader = get_metrics_uploader()
+    if not uploader:
         return
 
-    try:
-        metrics = st.session_state.metrics
+    metrics = st.session_state.metrics
+    metrics["total_tokens"] = metrics["token_usage"].total
+    message_count = len(st.session_state.get("messages", []))
+    fingerprint = (
+        metrics["events"].total, metrics["errors"].total, len(metrics["cv_generation_attempts"]),
+        message_count, metrics["total_tokens"],
+    )
+    if st.session_state.get("metrics_saved_fingerprint") == fingerprint:
+        return
 
+    try:
         # Prepare data for database
         session_data = {
             "session_id": metrics["session_id"],
@@ -284,23 +567,405 @@ def save_session_metrics():
             "session_duration": get_session_duration(),
             "first_user_input": metrics["first_user_input"].isoformat() if metrics["first_user_input"] else None,
             "cv_generated": len(metrics["cv_generation_attempts"]) > 0,
-            "cv_downloaded": any(e["event"] == "cv_downloaded" for e in metrics["events"]),
+            "cv_downloaded": metrics["cv_downloaded"],
             "generation_attempts": len(metrics["cv_generation_attempts"]),
-            "message_count": len(st.session_state.get("messages", [])),
+            "message_count": message_count,
             "total_tokens": metrics["total_tokens"],
-            "errors_count": len(metrics["errors"]),
+            "token_usage": json.dumps(metrics["token_usage"].by_task()),
+            "errors_count": metrics["errors"].total,
             "device_type": metrics["device_info"].get("type"),
             "entry_source": metrics["entry_source"],
-            "events": json.dumps(metrics["events"]),
-            "errors": json.dumps(metrics["errors"]),
+            "events": json.dumps([_record_to_dict(e) for e in metrics["events"].snapshot()]),
+            "errors": json.dumps([_record_to_dict(e) for e in metrics["errors"].snapshot()]),
             "completion_times": json.dumps([a["time_from_start"] for a in metrics["cv_generation_attempts"]])
         }
 
-        # Insert into Supabase
-        supabase.table('sessions').insert(session_data).execute()
+        uploader.spool.append(session_data)
+        st.session_state.metrics_saved_fingerprint = fingerprint
 
     except Exception as e:
-        print(f"Failed to save metrics to Supabase: {e}")
+        log_error("metrics_spool_failed", str(e))
+
+
+def get_metrics_upload_stats() -> Dict[str, Any]:
+    """Get counters of the session metrics spool and uploader."""
+    uploader = get_metrics_uploader()
+    return uploader.stats() if uploader else {"configured": False}
+
+
+# Process-wide timings, recorded from worker threads that can't use st.session_state
+_timings_lock = threading.Lock()
+_timings: Dict[str, Dict[str, float]] = {}
+
+
+def record_timing(name: str, seconds: float):
+    """Record the duration of a named operation. Safe to call from any thread.
+
+    Args:
+        name: Name of the operation (e.g., 'pdflatex_pass')
+        seconds: Duration in seconds
+    """
+    with _timings_lock:
+        timing = _timings.setdefault(name, {"count": 0, "total": 0.0, "min": seconds, "max": seconds, "last": seconds})
+        timing["count"] += 1
+        timing["total"] += seconds
+        timing["min"] = min(timing["min"], seconds)
+        timing["max"] = max(timing["max"], seconds)
+        timing["last"] = seconds
+
+
+def get_timing_stats() -> Dict[str, Dict[str, float]]:
+    """Get count, total, min, max, mean and last duration per recorded operation."""
+    with _timings_lock:
+        return {
+            name: {**timing, "mean": timing["total"] / timing["count"]}
+            for name, timing in _timings.items()
+        }
+
+
+# -----------------------------------------------------------------------------
+# Tracing
+# -----------------------------------------------------------------------------
+# Spans are handed to worker threads through contextvars, never through
+# st.session_state. Submit work with submit_traced (src.jobs does the same) so
+# its spans join the caller's trace.
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed operation within a trace.
+
+    Args:
+        name: Operation name
+        trace_id: ID shared by all spans of the trace
+        parent_id: span_id of the parent span, None for the root span
+        attributes: Initial attributes (e.g. token counts)
+    """
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "end_time", "attributes", "_perf_start")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.end_time = None
+        self.attributes = dict(attributes or {})
+        self._perf_start = time.perf_counter()
+
+    def elapsed(self) -> float:
+        """Seconds since the span started."""
+        return time.perf_counter() - self._perf_start
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end_time is None else self.end_time - self.start
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self):
+        """End the span and export it. Later calls do nothing."""
+        if self.end_time is not None:
+            return
+        self.end_time = self.start + self.elapsed()
+        record_timing(self.name, self.duration)
+        span_exporter.export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration": self.duration,
+            "attributes": dict(self.attributes),
+        }
+
+
+class LocalSpanExporter:
+    """Keeps the finished spans of the most recent traces in memory.
+
+    Args:
+        max_traces: Number of traces kept; the oldest are dropped first
+        path: Optional JSON Lines file every finished span is appended to
+    """
+
+    def __init__(self, max_traces: int, path: Optional[str] = None):
+        self.max_traces = max_traces
+        self.path = path
+        self.exported = 0
+        self.failed = 0
+        self._traces: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        record = span.to_dict()
+        error = None
+        with self._lock:
+            spans = self._traces.get(span.trace_id)
+            if spans is None:
+                spans = self._traces[span.trace_id] = []
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+            spans.append(record)
+            self.exported += 1
+
+            if self.path:
+                try:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                except OSError as e:
+                    self.failed += 1
+                    error = e
+
+        if error is not None:
+            log_error("span_export_failed", str(error), {"path": self.path})
+
+    def get_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """Get the finished spans of a trace, ordered by start time."""
+        with self._lock:
+            spans = list(self._traces.get(trace_id, []))
+        return sorted(spans, key=lambda span: span["start"])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "traces": len(self._traces),
+                "max_traces": self.max_traces,
+                "exported_spans": self.exported,
+                "failed_spans": self.failed,
+            }
+
+
+span_exporter = LocalSpanExporter(TRACE_MAX_TRACES, TRACE_EXPORT_PATH)
+
+
+def current_span() -> Optional[Span]:
+    """Get the span of the enclosing trace_span/start_trace block, if any."""
+    return _current_span.get()
+
+
+def start_span(name: str, parent: Optional[Span] = None, **attributes) -> Span:
+    """Start a span without making it current. Call span.end() when done.
+
+    For work that can't be wrapped in a with-block, such as a generator
+    consumed by the caller.
+
+    Args:
+        name: Operation name
+        parent: Parent span, defaults to the current span (none starts a new trace)
+        **attributes: Initial span attributes
+
+    Returns:
+        The started span
+    """
+    parent = parent or _current_span.get()
+    if parent is None:
+        return Span(name, uuid.uuid4().hex, None, attributes)
+    return Span(name, parent.trace_id, parent.span_id, attributes)
+
+
+@contextmanager
+def _activate(span: Span):
+    token = _current_span.set(span)
+    try:
+        yield span
+    except Exception as e:
+        span.set(error=type(e).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+def trace_span(name: str, **attributes):
+    """Time a with-block as a child of the current span.
+
+    Example:
+        with trace_span("build_prompt") as span:
+            span.set(tokens=...)
+    """
+    return _activate(start_span(name, **attributes))
+
+
+def start_trace(name: str, **attributes):
+    """Time a with-block as the root span of a new trace."""
+    return _activate(Span(name, uuid.uuid4().hex, None, attributes))
+
+
+def traced(name: Optional[str] = None):
+    """Decorator running the function inside trace_span (named after the function by default)."""
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with trace_span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def submit_traced(executor, fn, *args, **kwargs):
+    """executor.submit that keeps the caller's context: fn's spans join the
+    current trace and its token usage counts for the caller's session."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+# -----------------------------------------------------------------------------
+# Token usage
+# -----------------------------------------------------------------------------
+
+class TokenUsage:
+    """Token counts of LLM calls by task type. Safe to update from any thread."""
+
+    __slots__ = ("_tasks", "_lock")
+
+    def __init__(self):
+        self._tasks: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, task: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int):
+        with self._lock:
+            counts = self._tasks.setdefault(
+                task, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+            )
+            counts["calls"] += 1
+            counts["prompt_tokens"] += prompt_tokens
+            counts["completion_tokens"] += completion_tokens
+            counts["cached_tokens"] += cached_tokens
+
+    @property
+    def total(self) -> int:
+        """Prompt plus completion tokens of all tasks."""
+        with self._lock:
+            return sum(c["prompt_tokens"] + c["completion_tokens"] for c in self._tasks.values())
+
+    def by_task(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {task: dict(counts) for task, counts in self._tasks.items()}
+
+    # The lock can't be pickled, e.g. when session state is serialized
+    def __getstate__(self):
+        return self.by_task()
+
+    def __setstate__(self, state):
+        self._tasks = state
+        self._lock = threading.Lock()
+
+
+# Process-wide usage, and the usage of the session the current context belongs to
+_token_usage = TokenUsage()
+_session_token_usage: contextvars.ContextVar = contextvars.ContextVar("session_token_usage", default=None)
+
+
+def record_token_usage(task: str, usage, span: Optional[Span] = None):
+    """Record the token usage reported for a completion. Safe to call from any thread.
+
+    Counts go to the process totals, to the session bound to this context
+    (see initialize_session_metrics) and to the span's attributes.
+
+    Args:
+        task: Task type (e.g., 'chat', 'suggestions', 'cv_polish')
+        usage: The completion's usage object, None if the API sent none
+        span: Span to annotate, defaults to the current span
+    """
+    if usage is None:
+        return
+
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0
+
+    _token_usage.add(task, prompt_tokens, completion_tokens, cached_tokens)
+    session_usage = _session_token_usage.get()
+    if session_usage is not None:
+        session_usage.add(task, prompt_tokens, completion_tokens, cached_tokens)
+
+    span = span or _current_span.get()
+    if span is not None:
+        span.set(task=task, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                 cached_tokens=cached_tokens)
+
+
+def get_token_usage_stats() -> Dict[str, Any]:
+    """Get token usage by task type for this session and for the whole process."""
+    session = st.session_state.metrics["token_usage"].by_task() if "metrics" in st.session_state else {}
+    return {"session": session, "process": _token_usage.by_task()}
+
+
+def record_turn_trace(span: Span):
+    """Store a finished turn's duration and trace ID in the session metrics."""
+    metrics = st.session_state.metrics
+    metrics["response_times"].append(span.duration)
+    metrics["turn_traces"].append(span.trace_id)
+
+
+def get_turn_traces() -> List[Tuple[str, List[Dict[str, Any]]]]:
+    """Get the spans of this session's recent turns, newest first.
+
+    Returns:
+        List of (trace_id, spans) tuples
+    """
+    if "metrics" not in st.session_state:
+        return []
+    trace_ids = reversed(st.session_state.metrics["turn_traces"].snapshot())
+    return [(trace_id, span_exporter.get_trace(trace_id)) for trace_id in trace_ids]
+
+
+def get_trace_exporter_stats() -> Dict[str, Any]:
+    """Get the number of traces kept and spans exported."""
+    return span_exporter.stats()
+
+
+def format_trace_waterfall(spans: List[Dict[str, Any]], width: int = 40) -> str:
+    """Draw the spans of a trace as a text waterfall, one line per span.
+
+    Args:
+        spans: Span dicts ordered by start time (see LocalSpanExporter.get_trace)
+        width: Width of the time axis in characters
+
+    Returns:
+        str: The waterfall, children indented below their parents
+    """
+    if not spans:
+        return ""
+
+    by_id = {span["span_id"]: span for span in spans}
+    children = {}
+    for span in spans:
+        parent_id = span["parent_id"] if span["parent_id"] in by_id else None
+        children.setdefault(parent_id, []).append(span)
+
+    origin = min(span["start"] for span in spans)
+    total = max(span["start"] + span["duration"] - origin for span in spans) or 1e-9
+    scale = width / total
+
+    lines = []
+
+    def draw(span, depth):
+        offset = min(int((span["start"] - origin) * scale), width - 1)
+        length = max(1, round(span["duration"] * scale))
+        bar = (" " * offset + "█" * length)[:width].ljust(width)
+        label = ("  " * depth + span["name"])[:32].ljust(32)
+        line = f"{label} {bar} {span['duration'] * 1000:8.0f} ms"
+        if "ttft" in span["attributes"]:
+            line += f"  ttft {span['attributes']['ttft'] * 1000:.0f} ms"
+        if "error" in span["attributes"]:
+            line += f"  error: {span['attributes']['error']}"
+        lines.append(line)
+        for child in children.get(span["span_id"], []):
+            draw(child, depth + 1)
+
+    for root in children.get(None, []):
+        draw(root, 0)
+    return "\n".join(lines)
 
 
 def get_metrics_summary() -> Dict[str, Any]:
@@ -316,6 +981,45 @@ def get_metrics_summary() -> Dict[str, Any]:
         "cv_generated": len(metrics["cv_generation_attempts"]) > 0,
         "generation_attempts": len(metrics["cv_generation_attempts"]),
         "message_count": len(st.session_state.get("messages", [])),
-        "error_count": len(metrics["errors"]),
+        "error_count": metrics["errors"].total,
+        "total_tokens": metrics["token_usage"].total,
         "completion_time": calculate_completion_time()
     }
+
+
+def _deep_sizeof(obj, seen) -> int:
+    """Approximate memory used by obj and everything it references."""
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(_deep_sizeof(item, seen) for item in obj)
+    elif isinstance(obj, RingBuffer):
+        size += sum(_deep_sizeof(item, seen) for item in obj.snapshot())
+    return size
+
+
+def get_session_memory_usage(top: int = 15) -> Dict[str, Any]:
+    """Estimate the memory used by this session's state.
+
+    Objects other than containers (e.g. futures, clients) only count their
+    own size.
+
+    Args:
+        top: Number of largest keys to list
+
+    Returns:
+        Dictionary with the total bytes, key count and the largest keys
+    """
+    seen = set()
+    sizes = {key: _deep_sizeof(value, seen) for key, value in st.session_state.items()}
+    largest = sorted(sizes.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "total_bytes": sum(sizes.values()),
+        "keys": len(sizes),
+        "largest": dict(largest),
+    }
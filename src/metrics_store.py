@@ -0,0 +1,219 @@
+"""Local spool and background upload of session metrics.
+
+Session rows are written to a SQLite database in WAL mode, which is cheap
+enough to do on every script run. A background thread uploads them in
+batches to a sink (the Supabase `sessions` table, or a local stand-in).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class SupabaseSink:
+    """Upserts session rows into the Supabase `sessions` table.
+
+    Args:
+        client: Supabase client
+        table: Table name
+    """
+
+    def __init__(self, client, table="sessions"):
+        self.client = client
+        self.table = table
+
+    def write(self, rows):
+        # Upsert, since a session is saved again every time its metrics change
+        self.client.table(self.table).upsert(rows, on_conflict="session_id").execute()
+
+
+class LocalSink:
+    """Stand-in sink for tests and local runs, keeping the latest row per session.
+
+    Args:
+        path: Optional JSON Lines file every written row is appended to
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.rows = {}
+        self._lock = threading.Lock()
+
+    def write(self, rows):
+        with self._lock:
+            for row in rows:
+                self.rows[row["session_id"]] = row
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for row in rows:
+                        f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+class MetricsSpool:
+    """Write-ahead spool of session rows in SQLite (WAL mode).
+
+    Only the latest row per session is kept. Rows stay in the spool until
+    they have been uploaded; failed uploads are retried with exponential
+    backoff.
+
+    Args:
+        path: Path of the SQLite database file
+        max_backoff: Max seconds between retries of a failed row
+    """
+
+    def __init__(self, path, max_backoff=600):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        # Autocommit; the connection is shared by the script threads and the uploader
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS session_metrics (
+                session_id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL DEFAULT 0
+            )"""
+        )
+
+    def append(self, row):
+        """Store the latest metrics row of a session."""
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO session_metrics (session_id, payload, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    payload = excluded.payload, updated_at = excluded.updated_at, attempts = 0, next_attempt = 0""",
+                (row["session_id"], json.dumps(row, ensure_ascii=False), time.time()),
+            )
+
+    def pending(self, limit):
+        """Get up to limit rows due for upload.
+
+        Returns:
+            list: (session_id, updated_at, row) tuples
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT session_id, updated_at, payload FROM session_metrics "
+                "WHERE next_attempt <= ? ORDER BY updated_at LIMIT ?",
+                (time.time(), limit),
+            )
+            return [(session_id, updated_at, json.loads(payload)) for session_id, updated_at, payload in cursor]
+
+    def mark_uploaded(self, entries):
+        """Remove uploaded rows, unless the session was saved again meanwhile."""
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM session_metrics WHERE session_id = ? AND updated_at = ?",
+                [(session_id, updated_at) for session_id, updated_at, _ in entries],
+            )
+
+    def mark_failed(self, entries):
+        """Schedule a retry of rows that failed to upload."""
+        now = time.time()
+        with self._lock:
+            for session_id, updated_at, _ in entries:
+                self._conn.execute(
+                    "UPDATE session_metrics SET attempts = attempts + 1, "
+                    "next_attempt = ? + MIN(?, 5 * (1 << MIN(attempts, 16))) "
+                    "WHERE session_id = ? AND updated_at = ?",
+                    (now, self.max_backoff, session_id, updated_at),
+                )
+
+    def stats(self):
+        """Get the number of spooled rows and of rows waiting for a retry.
+
+        Returns:
+            dict: Spooled and retrying row counts
+        """
+        with self._lock:
+            spooled, retrying = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(attempts > 0), 0) FROM session_metrics"
+            ).fetchone()
+        return {"spooled": spooled, "retrying": retrying}
+
+
+class MetricsUploader:
+    """Uploads spooled rows to a sink from a background thread.
+
+    Args:
+        spool: MetricsSpool to read from
+        sink: Object with a write(rows) method
+        interval: Seconds between upload rounds
+        batch_size: Max rows per write
+        on_error: Optional callback on_error(exception) for failed rounds
+    """
+
+    def __init__(self, spool, sink, interval=30, batch_size=100, on_error=None):
+        self.spool = spool
+        self.sink = sink
+        self.interval = interval
+        self.batch_size = batch_size
+        self.on_error = on_error
+        self.uploaded = 0
+        self.failed_batches = 0
+        self.last_error = None
+        self._thread = None
+
+    def _record_failure(self, error):
+        self.failed_batches += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        if self.on_error is not None:
+            self.on_error(error)
+
+    def upload_pending(self):
+        """Upload all rows that are due, batch by batch.
+
+        Returns:
+            int: Number of rows uploaded
+        """
+        uploaded = 0
+        while True:
+            entries = self.spool.pending(self.batch_size)
+            if not entries:
+                return uploaded
+            try:
+                self.sink.write([row for _, _, row in entries])
+            except Exception as e:
+                self._record_failure(e)
+                self.spool.mark_failed(entries)
+                return uploaded
+
+            self.spool.mark_uploaded(entries)
+            uploaded += len(entries)
+            self.uploaded += len(entries)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.upload_pending()
+            except Exception as e:
+                # e.g. sqlite3.OperationalError "database is locked"; retry next round
+                self._record_failure(e)
+
+    def start(self):
+        """Start the background upload thread (once)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="metrics-uploader", daemon=True)
+            self._thread.start()
+
+    def stats(self):
+        """Get upload counters and spool size.
+
+        Returns:
+            dict: Uploaded rows, failed batches, last error, spooled and retrying rows
+        """
+        return {
+            "uploaded": self.uploaded,
+            "failed_batches": self.failed_batches,
+            "last_error": self.last_error,
+            **self.spool.stats(),
+        }
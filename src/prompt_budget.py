@@ -0,0 +1,132 @@
+"""Offline token estimation and token budgeting for prompt assembly."""
+
+import json
+import math
+import re
+from collections import namedtuple
+
+# A prompt section to fit into the budget.
+#   priority: lower priority sections are trimmed first
+#   budget: max estimated tokens for this section on its own
+#   compress: optional zero-argument callable returning a smaller, lossless-ish
+#             version of the text, tried before truncating
+#   keep: "head" or "tail", which end of the text survives truncation
+PromptSection = namedtuple("PromptSection", ["name", "text", "priority", "budget", "compress", "keep"])
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+TRUNCATION_MARKER = "[...]"
+
+
+def estimate_tokens(text):
+    """Estimate the number of LLM tokens in a text without a tokenizer.
+
+    Each word counts as one token per started 4 characters and each
+    punctuation character as one token, which is close enough to BPE
+    tokenizers for budgeting purposes.
+
+    Args:
+        text: Text to estimate
+
+    Returns:
+        int: Estimated token count
+    """
+    if not text:
+        return 0
+    return sum(math.ceil(len(t) / 4) for t in _TOKEN_PATTERN.findall(text))
+
+
+def truncate_to_tokens(text, max_tokens, keep="head"):
+    """Truncate text to roughly max_tokens estimated tokens.
+
+    Args:
+        text: Text to truncate
+        max_tokens: Token budget for the result
+        keep: "head" keeps the start of the text, "tail" keeps the end
+
+    Returns:
+        str: The text itself if it fits, otherwise the kept part with a marker
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    # Leave room for the marker itself
+    max_tokens -= estimate_tokens(TRUNCATION_MARKER)
+    if max_tokens <= 0:
+        return ""
+
+    matches = list(_TOKEN_PATTERN.finditer(text))
+    if keep == "tail":
+        matches.reverse()
+
+    used = 0
+    cut = None
+    for match in matches:
+        used += math.ceil(len(match.group()) / 4)
+        if used > max_tokens:
+            cut = match
+            break
+
+    if keep == "tail":
+        return TRUNCATION_MARKER + text[cut.end():]
+    return text[:cut.start()] + TRUNCATION_MARKER
+
+
+def compact_cv_data(cv_dict, keep_indexes=False):
+    """Serialize CV data compactly, dropping empty fields and entries.
+
+    Args:
+        cv_dict: CV data dictionary
+        keep_indexes: Keep empty list entries (as {} or ""), so list indexes
+            match cv_dict, e.g. for patch paths
+
+    Returns:
+        str: Compact JSON string with only filled-in values
+    """
+    def prune(value):
+        if isinstance(value, dict):
+            pruned = {k: prune(v) for k, v in value.items()}
+            return {k: v for k, v in pruned.items() if v not in ("", None, [], {})}
+        if isinstance(value, list):
+            pruned = [prune(v) for v in value]
+            if keep_indexes:
+                return pruned
+            return [v for v in pruned if v not in ("", None, [], {})]
+        return value
+
+    return json.dumps(prune(cv_dict), ensure_ascii=False, separators=(",", ":"))
+
+
+def _shrink(section, text, max_tokens):
+    """Shrink a section's text to max_tokens, compressing before truncating."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if section.compress is not None:
+        text = section.compress()
+    return truncate_to_tokens(text, max_tokens, section.keep)
+
+
+def fit_sections(sections, total_budget, reserved_tokens=0):
+    """Fit prompt sections into their own budgets and a total budget.
+
+    Every section is first limited to its own budget. If the sum still exceeds
+    the total budget, the lowest priority sections are trimmed first.
+
+    Args:
+        sections: List of PromptSection
+        total_budget: Max estimated tokens for the whole prompt
+        reserved_tokens: Tokens used by fixed parts of the prompt (e.g. instructions)
+
+    Returns:
+        dict: Section name -> fitted text
+    """
+    fitted = {s.name: _shrink(s, s.text or "", s.budget) for s in sections}
+
+    overflow = reserved_tokens + sum(estimate_tokens(t) for t in fitted.values()) - total_budget
+    for section in sorted(sections, key=lambda s: s.priority):
+        if overflow <= 0:
+            break
+        tokens = estimate_tokens(fitted[section.name])
+        fitted[section.name] = _shrink(section, fitted[section.name], tokens - overflow)
+        overflow -= tokens - estimate_tokens(fitted[section.name])
+
+    return fitted
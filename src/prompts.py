@@ -2,6 +2,8 @@
 
 import textwrap
 
+from src.schemas import CV_SCHEMA, CV_PATCH_PATH_SEPARATOR, schema_paths
+
 # Instructions for JSON data extraction from conversation
 INSTRUCTIONS_GENERATE_DATA_FROM_RESPONSE = textwrap.dedent("""
     - Du er en hjelpfull AI assistent som skal trekke ut informasjon fra en samtale med en bruker for å generere en JSON strukturert datafil som kan brukes til å lage en god CV.
@@ -75,21 +77,41 @@ INSTRUCTIONS_GENERATE_DATA_FROM_RESPONSE = textwrap.dedent("""
         }
     - Returner KUN informasjonen brukeren nettopp ga (ikke informasjon fra samtale historien) f.ks.: "Personalia": {"Navn": "Ola Nordmann", "Fødseldato": "01.01.2000"}
     - Ellers legg til ny informasjon i lister (f.eks. utdanning, arbeidserfaring, ferdigheter osv.).
-    - Dersom du ikke har fått informasjon om et felt, la det være tomt.
+    - Dersom du ikke har fått informasjon om et felt, sett det til null eller utelat det.
 """)
 
 
-def get_instructions(session_state):
+# Instructions for patch-based data extraction from conversation
+INSTRUCTIONS_GENERATE_PATCHES_FROM_RESPONSE = textwrap.dedent("""
+    - Du er en hjelpfull AI assistent som skal trekke ut informasjon fra en samtale med en bruker for å oppdatere en JSON strukturert CV.
+    - Du vil få spørsmål fra assistenten og svar fra brukeren, og ditt mål er å trekke ut relevant informasjon og forstå hvilke spørsmål infromasjonen svarer på.
+    - Returner KUN endringer for informasjonen brukeren nettopp ga (ikke informasjon fra samtale historien), som en liste med operasjoner {"op", "path", "value"}:
+        - "set": sett tekstfeltet i "path" til "value".
+        - "append": legg til et nytt element i listen i "path". For lister med objekter er "value" tom, og feltene fylles med "set" på indeks -1 etterpå (eller "value" er et JSON-objekt med feltene). For lister med tekst er "value" teksten.
+        - "remove": fjern listeelementet eller tøm tekstfeltet i "path".
+    - Stier bruker "%(sep)s" mellom feltene og tall for listeindekser (-1 er siste element). Gyldige stier (<i> er en indeks):
+        %(paths)s
+    - Eksempel: [{"op": "set", "path": "Personalia%(sep)sNavn", "value": "Ola Nordmann"}, {"op": "append", "path": "Utdanning", "value": ""}, {"op": "set", "path": "Utdanning%(sep)s-1%(sep)sSkole", "value": "NTNU"}]
+    - Nåværende CV-data står i <cv_data>, med alle listeelementer på sin indeks (0 er første element).
+    - Legg til nye elementer med "append" (f.eks. ny utdanning eller ny stilling). Gjelder informasjonen et element som allerede finnes i <cv_data>, bruk indeksen til det elementet. Bruk -1 bare for elementet som nettopp ble lagt til eller er sist i listen.
+    - Dersom brukeren ikke ga ny informasjon, returner en tom liste.
+""") % {"sep": CV_PATCH_PATH_SEPARATOR, "paths": "\n    ".join(schema_paths(CV_SCHEMA))}
+
+
+def get_instructions(session_state, cv_data=None, user_message=None):
     """Generate dynamic instructions based on current session state.
 
     Args:
         session_state: Streamlit session state object
+        cv_data: CV data text to embed, e.g. after token budgeting (defaults to CV_dict)
+        user_message: User message text to embed (defaults to session state user_message)
 
     Returns:
         str: Dynamic instructions for the conversational assistant
     """
-    cv_dict = session_state.get('CV_dict', {})
-    user_message = session_state.get('user_message', {})
+    cv_dict = session_state.get('CV_dict', {}) if cv_data is None else cv_data
+    if user_message is None:
+        user_message = session_state.get('user_message', {})
 
     return textwrap.dedent(f"""
     - Du er en hjelpfull AI assistent som skal samle informasjon fra brukeren som er nødvendig for å generere en god CV.
@@ -75,3 +75,116 @@ CV_SCHEMA = {
         }
     ]
 }
+
+
+# Fields that identify an entry in each list of objects, used to deduplicate
+# and merge entries (paths use CV_PATCH_PATH_SEPARATOR)
+CV_LIST_IDENTITY_KEYS = {
+    "Utdanning": ("Skole", "Grad"),
+    "Arbeidserfaring.Stillinger": ("Firma", "Tittel"),
+    "Arbeidserfaring.Dugnad": ("Oppdrag",),
+    "Ferdigheter.Ferdigheter_og_kompetanser": ("Ferdighet",),
+    "Ferdigheter.Språk": ("Språk",),
+    "Interesser_og_hobbyer": ("Interesse/Hobby",),
+    "Fremtidige_mål.Jobbønsker": ("Jobbønske",),
+    "Referanser": ("Navn",),
+}
+
+
+def to_json_schema(template, nullable=False):
+    """Derive a strict JSON Schema from a CV_SCHEMA-style template.
+
+    Dicts become objects with no extra fields, lists become arrays of their
+    first item's schema (strings if empty) and all leaf values are strings.
+    Strict mode requires every field, so fields below the root are nullable
+    and the model can send null for what it doesn't know (dropped by
+    data_utils.validate_cv_data).
+
+    Args:
+        template: CV_SCHEMA or a part of it
+        nullable: Whether the value itself may be null
+
+    Returns:
+        dict: JSON Schema usable with OpenAI structured outputs
+    """
+    if isinstance(template, dict):
+        schema = {
+            "type": "object",
+            "properties": {key: to_json_schema(value, nullable=True) for key, value in template.items()},
+            "required": list(template.keys()),
+            "additionalProperties": False,
+        }
+    elif isinstance(template, list):
+        schema = {"type": "array", "items": to_json_schema(template[0] if template else "")}
+    else:
+        schema = {"type": "string"}
+
+    if nullable:
+        schema["type"] = [schema["type"], "null"]
+    return schema
+
+
+# JSON Schema and OpenAI response format for structured CV extraction
+CV_JSON_SCHEMA = to_json_schema(CV_SCHEMA)
+CV_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "cv_data", "strict": True, "schema": CV_JSON_SCHEMA},
+}
+
+
+# Patch operations returned by the extraction LLM (see data_utils.apply_cv_patches)
+CV_PATCH_OPS = ["set", "append", "remove"]
+
+# Separator between path segments, "/" is used inside some field names
+CV_PATCH_PATH_SEPARATOR = "."
+
+CV_PATCH_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "patches": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "op": {"type": "string", "enum": CV_PATCH_OPS},
+                    "path": {"type": "string"},
+                    "value": {"type": "string"},
+                },
+                "required": ["op", "path", "value"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["patches"],
+    "additionalProperties": False,
+}
+CV_PATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "cv_patches", "strict": True, "schema": CV_PATCH_JSON_SCHEMA},
+}
+
+
+def schema_paths(template, prefix=""):
+    """List the patchable paths of a CV_SCHEMA-style template.
+
+    List items are shown with the index placeholder "<i>".
+
+    Args:
+        template: CV_SCHEMA or a part of it
+        prefix: Path of the template
+
+    Returns:
+        list[str]: Paths such as "Utdanning", "Utdanning.<i>.Grad"
+    """
+    sep = CV_PATCH_PATH_SEPARATOR
+    if isinstance(template, dict):
+        paths = []
+        for key, value in template.items():
+            paths += schema_paths(value, f"{prefix}{sep}{key}" if prefix else key)
+        return paths
+    if isinstance(template, list):
+        paths = [prefix]
+        if template and isinstance(template[0], dict):
+            paths += schema_paths(template[0], f"{prefix}{sep}<i>")
+        return paths
+    return [prefix]
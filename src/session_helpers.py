@@ -1,11 +1,30 @@
 """Session state and data extraction helpers for Streamlit CV Generator."""
 
+import copy
 import datetime
+import re
 import streamlit as st
 
-from src.llm_client import build_question_prompt, get_response, generator_to_string
-from src.data_utils import save_json_str_to_dict, extract_personalia_from_json
-from src.metrics import initialize_session_metrics, log_event
+from src.config import HISTORY_LENGTH, SUMMARIZE_OLD_HISTORY, EXTRACTION_MODE, EXTRACTION_FORMAT
+from src.schemas import CV_RESPONSE_FORMAT, CV_PATCH_RESPONSE_FORMAT
+from src.llm_client import (
+    build_question_prompt,
+    get_response,
+    generator_to_string,
+    generate_chat_summary,
+    executor
+)
+from src.data_utils import save_json_str_to_dict, save_patch_str_to_dict, extract_personalia
+from src.cv_generator import generate_cv_documents, CV_GENERATION_STAGES
+from src.jobs import submit_job, get_job
+from src.metrics import (
+    initialize_session_metrics,
+    log_event,
+    log_error,
+    get_session_duration,
+    traced,
+    submit_traced
+)
 
 
 def initialize_app_session_state():
@@ -21,6 +40,18 @@ def initialize_app_session_state():
     if "selected_pill_suggestions" not in st.session_state:
         st.session_state.selected_pill_suggestions = []
 
+    # Pending background JSON extraction (a Future, see start_json_extraction)
+    if "json_extraction" not in st.session_state:
+        st.session_state.json_extraction = None
+
+    # Rolling summary of messages that fell out of the history window
+    if "history_summary" not in st.session_state:
+        reset_history_summary()
+
+    # Background CV generation job (see start_cv_generation)
+    if "cv_job_id" not in st.session_state:
+        st.session_state.cv_job_id = None
+
     # Initialize draft message text (editable version of selected pills)
     if "draft_message_text" not in st.session_state:
         st.session_state.draft_message_text = ""
@@ -33,39 +64,298 @@ def initialize_app_session_state():
         log_event("session_started", {"entry_source": source})
 
 
-def extract_and_save_json_data(client):
-    """Extract JSON data from conversation and save to session state.
+# Per-message state left behind by the suggestion sidebar (see ui_helpers), keyed
+# by the message's key suffix. Widget keys are cleaned up by Streamlit itself.
+_MESSAGE_STATE_KEY_PATTERN = re.compile(
+    r"^(?:suggestions|suggestion_pool|regenerate)_(?P<suffix>(?:history|user|pdf)_\d+)$"
+)
+
+
+def collect_stale_message_state():
+    """Remove per-message suggestion state that no message uses anymore.
+
+    Only the last message is shown with its suggestion sidebar (key suffix
+    history_<index>). State for other suffixes, including the user_/pdf_
+    suffixes used while a message streams, is left over from earlier runs.
+    Call before any message is streamed in the current run.
+
+    Returns:
+        int: Number of removed keys
+    """
+    live_suffix = f"history_{len(st.session_state.get('messages', [])) - 1}"
+    stale = []
+    for key in st.session_state.keys():
+        match = _MESSAGE_STATE_KEY_PATTERN.match(key)
+        if match and match.group("suffix") != live_suffix:
+            stale.append(key)
+
+    for key in stale:
+        del st.session_state[key]
+    return len(stale)
+
+
+@traced("json_extraction")
+def _extract_json_str(client, json_prompt):
+    """Run the JSON extraction LLM call (executed on a worker thread).
 
     Args:
         client: OpenAI client instance
+        json_prompt: Prompt built by build_question_prompt(json_generator=True)
+
+    Returns:
+        str: Raw JSON string from the LLM (patches or CV object, see EXTRACTION_FORMAT)
     """
-    if not st.session_state.get("CV_mode", False) or len(st.session_state.messages) < 3:
+    response_format = None
+    if EXTRACTION_MODE == "structured":
+        response_format = CV_PATCH_RESPONSE_FORMAT if EXTRACTION_FORMAT == "patches" else CV_RESPONSE_FORMAT
+    json_response_gen = get_response(client, json_prompt, response_format=response_format, task="json_extraction")
+    return generator_to_string(json_response_gen)
+
+
+def start_json_extraction(client, user_message):
+    """Start extracting CV data from the user's answer in the background.
+
+    The extraction only needs the assistant's last question and the user's
+    answer, so it runs concurrently with the assistant's response. The result
+    is merged into CV_dict later by apply_json_extraction.
+
+    Args:
+        client: OpenAI client instance
+        user_message: The user's answer to the last assistant question
+    """
+    if not st.session_state.get("CV_mode", False):
         return
 
-    assistant_question = st.session_state.messages[-3]["content"]
-    user_answer = st.session_state.messages[-2]["content"]
+    assistant_messages = [m for m in st.session_state.messages if m["role"] == "assistant"]
+    if not assistant_messages:
+        return
+    assistant_question = assistant_messages[-1]["content"]
 
-    # Build JSON extraction prompt
+    # Build JSON extraction prompt here, the worker thread must not touch session state
     json_prompt = build_question_prompt(
-        st.session_state.messages,
-        f"Spørsmål: {assistant_question}\nSvar: {user_answer}",
+        st.session_state.messages + [{"role": "user", "content": user_message}],
+        f"Spørsmål: {assistant_question}\nSvar: {user_message}",
         json_generator=True
     )
 
-    # Get JSON response from LLM
-    json_response_gen = get_response(client, json_prompt)
-    json_str = generator_to_string(json_response_gen)
+    st.session_state.json_extraction = submit_traced(executor, _extract_json_str, client, json_prompt)
+
+
+def has_pending_json_extraction():
+    """Check whether a background extraction is waiting to be merged."""
+    return st.session_state.get("json_extraction") is not None
+
+
+@st.fragment(run_every=1)
+def poll_json_extraction():
+    """Poll the background extraction and rerun the app once it is done."""
+    future = st.session_state.get("json_extraction")
+    if future is not None and future.done():
+        st.rerun()
+
+
+def apply_json_extraction(wait=False):
+    """Merge the result of the background extraction into session state.
+
+    Each extraction is removed from session state before its result is
+    applied, so it can never be merged twice.
+
+    Args:
+        wait: Block until the extraction is done. Use when the caller needs
+            an up-to-date CV_dict (e.g. building the next prompt).
+
+    Returns:
+        bool: True if an extraction result was merged
+    """
+    future = st.session_state.get("json_extraction")
+    if future is None or (not wait and not future.done()):
+        return False
+
+    st.session_state.json_extraction = None
+
+    try:
+        json_str = future.result()
+    except Exception as e:
+        log_error("json_extraction_failed", str(e))
+        return False
+
+    # Save extracted data to session state
+    if EXTRACTION_FORMAT == "patches":
+        save_patch_str_to_dict(st.session_state, json_str)
+    else:
+        save_json_str_to_dict(st.session_state, json_str)
 
     # Handle personalia extraction on initial questions
     if st.session_state.get("initial_CV_questions", False) and not st.session_state.get("CV_uploaded", False):
         try:
-            name, dob = extract_personalia_from_json(json_str)
+            name, dob = extract_personalia(st.session_state.CV_dict)
             st.session_state.personalia_name = name
             st.session_state.personalia_dob = dob
             st.session_state.initial_CV_questions = False
-        except:
+        except ValueError:
             st.write("\nKunne ikke hente personalia. Vennligst skriv inn navn og fødselsdato (DD.MM.ÅÅ) på nytt.")
             st.session_state.initial_CV_questions = True
 
-    # Save extracted data to session state
-    save_json_str_to_dict(st.session_state, json_str)
+    return True
+
+
+def start_history_summary_update(client):
+    """Fold messages that fell out of the history window into the rolling summary.
+
+    Runs in the background and only sends the messages not yet covered by the
+    summary, together with the current summary text.
+
+    Args:
+        client: OpenAI client instance
+    """
+    if not SUMMARIZE_OLD_HISTORY or st.session_state.history_summary_task is not None:
+        return
+
+    messages = st.session_state.messages
+    old_count = max(len(messages) - HISTORY_LENGTH, 0)
+    summary = st.session_state.history_summary
+
+    # Conversation was reset, start over
+    if summary["covered"] > old_count:
+        summary = st.session_state.history_summary = {"text": "", "covered": 0}
+
+    if old_count == summary["covered"]:
+        return
+
+    future = submit_traced(
+        executor,
+        generate_chat_summary,
+        client,
+        messages[summary["covered"]:old_count],
+        summary["text"] or None
+    )
+    st.session_state.history_summary_task = (future, old_count)
+
+
+def reset_history_summary():
+    """Forget the rolling summary and any running update. Call whenever messages are reset."""
+    st.session_state.history_summary = {"text": "", "covered": 0}
+    st.session_state.history_summary_task = None
+
+
+def apply_history_summary():
+    """Store the result of the background summary update, if it is done."""
+    task = st.session_state.history_summary_task
+    if task is None or not task[0].done():
+        return
+
+    st.session_state.history_summary_task = None
+    future, covered = task
+
+    # Summary of a conversation that has been reset since
+    if covered > max(len(st.session_state.messages) - HISTORY_LENGTH, 0):
+        return
+
+    try:
+        st.session_state.history_summary = {"text": future.result(), "covered": covered}
+    except Exception as e:
+        log_error("history_summary_failed", str(e))
+
+
+# Progress labels for the CV generation stages
+CV_STAGE_LABELS = {
+    "cleanup": "Rydder opp i CV-data",
+    "render": "Lager oppsett",
+    "compile": "Lager PDF",
+    "docx": "Lager Word-dokument",
+}
+
+
+def _current_cv_job():
+    job_id = st.session_state.get("cv_job_id")
+    return get_job(job_id) if job_id else None
+
+
+def start_cv_generation(client):
+    """Start generating the CV documents in the background.
+
+    A click while this session's job is still running joins that job
+    instead of starting a new one.
+
+    Args:
+        client: OpenAI client instance
+
+    Returns:
+        str: ID of the (new or already running) job
+    """
+    job = _current_cv_job()
+    if job is not None and not job.done():
+        log_event("cv_generation_joined", {"job_id": job.id})
+        return job.id
+
+    # The job must see this turn's extraction, and gets its own copy of the data
+    apply_json_extraction(wait=True)
+    cv_dict = copy.deepcopy(st.session_state.CV_dict)
+
+    job_id = submit_job(generate_cv_documents, client, cv_dict, stages=CV_GENERATION_STAGES)
+    st.session_state.cv_job_id = job_id
+    return job_id
+
+
+def has_pending_cv_generation():
+    """Check whether a CV generation job is waiting to be applied."""
+    return st.session_state.get("cv_job_id") is not None
+
+
+@st.fragment(run_every=1)
+def poll_cv_generation():
+    """Show the progress of the CV generation job and rerun the app once it is done."""
+    job = _current_cv_job()
+    if job is None or job.done():
+        st.rerun()
+
+    progress = job.progress()
+    label = ", ".join(CV_STAGE_LABELS[stage] for stage in progress["running"]) or "Genererer CV"
+    st.progress(progress["fraction"], text=f"{label}... ({progress['elapsed']:.0f} s)")
+
+
+def apply_cv_generation():
+    """Store the generated CV documents in session state, if the job is done.
+
+    Returns:
+        bool: True if the job finished (successfully or not) and was applied
+    """
+    job_id = st.session_state.get("cv_job_id")
+    if job_id is None:
+        return False
+
+    job = get_job(job_id)
+    if job is None:
+        # Pruned before this session came back to it
+        st.session_state.cv_job_id = None
+        return False
+    if not job.done():
+        return False
+
+    st.session_state.cv_job_id = None
+
+    try:
+        pdf_bytes, docx_bytes = job.result()
+        if pdf_bytes is None:
+            raise FileNotFoundError("pdflatex did not produce a PDF")
+    except FileNotFoundError as e:
+        log_error("cv_generation_pdf_not_found", str(e))
+        st.error("PDF ikke funnet. Vennligst prøv å generere CVen på nytt.")
+        return True
+    except Exception as e:
+        log_error("cv_generation_failed", str(e))
+        st.error(f"Feil under generering av CV: {str(e)}")
+        return True
+
+    st.session_state["CV_pdf"] = pdf_bytes
+    if docx_bytes:
+        st.session_state["CV_docx"] = docx_bytes
+
+    st.success("CV generert!")
+    st.session_state.generate_CV_button_clicked = True
+    log_event("cv_generated_success", {
+        "message_count": len(st.session_state.get("messages", [])),
+        "session_duration": get_session_duration(),
+        "generation_seconds": job.progress()["elapsed"],
+    })
+    return True
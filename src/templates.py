@@ -1,6 +1,7 @@
 """LaTeX and document templates for CV generation."""
 
 import textwrap
+from string import Template
 
 # LaTeX Template for CV Generation
 LATEX_TEMPLATE = textwrap.dedent(r"""
@@ -185,3 +186,114 @@ LATEX_TEMPLATE = textwrap.dedent(r"""
 
     \end{document}
 """)
+
+
+# Preamble shared by every rendered CV (everything before \begin{document})
+LATEX_PREAMBLE = LATEX_TEMPLATE.split(r"\begin{document}")[0]
+
+# Building blocks for cv_generator.render_latex_cv, filled with escaped CV data.
+# string.Template ($name) is used since LaTeX braces clash with str.format.
+LATEX_DOCUMENT = Template(r"""$preamble\begin{document}
+
+$body
+
+\end{document}
+""")
+
+LATEX_HEADER = Template(r"""% ---------- Header ----------
+\begin{center}
+    {\fontsize{28pt}{30pt}\selectfont \textbf{$name}} \\[12pt]
+    \small
+    $contact
+\end{center}
+
+\vspace{0.8cm}""")
+
+LATEX_CONTACT_ITEMS = {
+    "Fødselsdato": r"\faBirthdayCake \ ",
+    "Epost": r"\faEnvelope[regular] \ ",
+    "Telefonnummer": r"\faPhone* \ ",
+    "Adresse": r"\faMapMarker* \ ",
+}
+LATEX_CONTACT_SEPARATOR = r" \quad | \quad" + "\n    "
+
+LATEX_SECTION = Template(r"""\section{$title}
+$content""")
+
+LATEX_SUBSECTION = Template(r"""\subsection*{$title}
+$content""")
+
+LATEX_TWOCOL_ENTRY = Template(r"""\begin{twocolentry}{$right}
+    $left$highlights
+\end{twocolentry}""")
+
+LATEX_ONECOL_ENTRY = Template(r"""\begin{onecolentry}
+    $content
+\end{onecolentry}""")
+
+LATEX_HIGHLIGHTS = Template(r"""
+    \begin{highlights}
+$items
+    \end{highlights}""")
+
+LATEX_HIGHLIGHT_ITEM = Template(r"        \item $text")
+
+
+# HTML versions of the building blocks above, same layout as LATEX_TEMPLATE.
+# Used for the PyMuPDF PDF renderer (no TeX install needed).
+HTML_CSS = """
+body { font-family: sans-serif; font-size: 10pt; }
+p { margin: 0; }
+.name { font-size: 28pt; font-weight: bold; text-align: center; margin-bottom: 12pt; }
+.contact { font-size: 9pt; text-align: center; margin-bottom: 0.8cm; }
+h2 { font-size: 14pt; font-weight: bold; color: rgb(0, 79, 144); margin: 0.3cm 0 0 0; }
+hr { border-top: 0.8pt solid rgb(0, 79, 144); height: 0.8pt; background-color: rgb(0, 79, 144); margin: 0 0 0.2cm 0; }
+h3 { font-size: 11pt; font-weight: bold; margin: 0.3cm 0 0.1cm 0; }
+table.entry { width: 100%; margin: 0 0 0.1cm 0; }
+td { vertical-align: top; padding: 0 0.2cm; }
+td.right { width: 4.5cm; text-align: right; }
+div.entry { margin: 0 0.2cm 0.1cm 0.2cm; }
+ul { margin: 0.1cm 0 0 0.5cm; }
+li { margin: 0; }
+"""
+
+HTML_DOCUMENT = Template("""<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><style>$css</style></head>
+<body>
+$body
+</body>
+</html>
+""")
+
+HTML_HEADER = Template("""<p class="name">$name</p>
+<p class="contact">$contact</p>""")
+
+HTML_CONTACT_ITEMS = {
+    "Fødselsdato": "",
+    "Epost": "",
+    "Telefonnummer": "",
+    "Adresse": "",
+}
+HTML_CONTACT_SEPARATOR = " &nbsp;|&nbsp; "
+
+HTML_SECTION = Template("""<h2>$title</h2>
+<hr>
+$content""")
+
+HTML_SUBSECTION = Template("""<h3>$title</h3>
+$content""")
+
+HTML_TWOCOL_ENTRY = Template("""<table class="entry"><tr>
+<td class="left">$left$highlights</td>
+<td class="right">$right</td>
+</tr></table>""")
+
+HTML_ONECOL_ENTRY = Template("""<div class="entry">$content</div>""")
+
+HTML_HIGHLIGHTS = Template("""
+<ul>
+$items
+</ul>""")
+
+HTML_HIGHLIGHT_ITEM = Template("<li>$text</li>")
@@ -1,10 +1,13 @@
 """UI helper functions for Streamlit CV Generator."""
 
 import time
+from concurrent.futures import Future
 import streamlit as st
-from concurrent.futures import ThreadPoolExecutor, Future
+import streamlit.components.v1 as components
+from src.config import PREVIEW_HEIGHT
+from src.cv_generator import render_html_preview
 from src.data_utils import parse_examples_to_list, calculate_cv_completion
-from src.metrics import track_cv_generation_attempt
+from src.metrics import track_cv_generation_attempt, submit_traced
 
 
 def render_vertical_progress_bar(completion_percentage):
@@ -55,6 +58,53 @@ def render_vertical_progress_bar(completion_percentage):
     st.markdown(progress_html, unsafe_allow_html=True)
 
 
+def prefetch_suggestion_variations(client, question, state):
+    """Start filling the variation pool of a message in the background.
+
+    Does nothing while the pool still has suggestion sets or a refill is pending.
+
+    Args:
+        client: OpenAI client instance
+        question: The assistant message the suggestions belong to
+        state: Dict holding the "suggestion_pool" list and the pending
+            "suggestion_pool_future" (e.g. the message itself)
+    """
+    from src.llm_client import generate_suggestion_variations, extract_question, executor
+
+    if state.get("suggestion_pool") or state.get("suggestion_pool_future") is not None:
+        return
+    # Read session state here, the worker thread must not touch it
+    user_data = st.session_state.get("CV_dict", {})
+    state["suggestion_pool_future"] = submit_traced(
+        executor, generate_suggestion_variations, client, extract_question(question), user_data
+    )
+
+
+def next_suggestion_variation(client, question, state):
+    """Take the next suggestion set from the variation pool of a message.
+
+    The pool is filled ahead of time by prefetch_suggestion_variations (one
+    LLM call for several sets) and refilled as soon as it runs empty, so
+    "Regenerer forslag" clicks are served without waiting.
+
+    Args:
+        client: OpenAI client instance
+        question: The assistant message the suggestions belong to
+        state: Dict holding the pool (see prefetch_suggestion_variations)
+
+    Returns:
+        str: Next suggestion set, or None if none could be generated
+    """
+    pool = state.setdefault("suggestion_pool", [])
+    if not pool:
+        prefetch_suggestion_variations(client, question, state)
+        # Only waits if the prefetch hasn't finished yet
+        pool.extend(state.pop("suggestion_pool_future").result())
+    suggestion = pool.pop(0) if pool else None
+    prefetch_suggestion_variations(client, question, state)
+    return suggestion
+
+
 def display_message_with_suggestions(message_content, suggestions, key_suffix, client=None, message_index=None):
     """Display assistant message with clickable suggestion examples in sidebar.
 
@@ -87,26 +137,13 @@ def display_message_with_suggestions(message_content, suggestions, key_suffix, c
                 # Create small button with custom styling
                 col_btn1, col_btn2 = st.columns([0.1, 0.9])
                 with col_btn1:
-                    # Check if currently regenerating
-                    regenerating_key = f"regenerating_{key_suffix}"
-                    if st.session_state.get(regenerating_key, False):
-                        # Show spinner instead of button
-                        with st.spinner(""):
-                            from src.llm_client import generate_adaptive_suggestions
-                            # Get context and request variation
-                            user_data = st.session_state.get("CV_dict", {})
-                            new_suggestions = generate_adaptive_suggestions(client, message_content, user_data, request_variation=True)
-                            # Update message suggestions in session state
-                            st.session_state.messages[message_index]["suggestions"] = new_suggestions
-                            # Clear the regenerating flag
-                            st.session_state[regenerating_key] = False
-                            st.rerun()
-                    else:
-                        # Show button
-                        if st.button("🔄", key=f"regenerate_btn_{key_suffix}", help="Regenerer forslag"):
-                            # Set regenerating flag and rerun
-                            st.session_state[regenerating_key] = True
-                            st.rerun()
+                    # Variations are generated in the background while the
+                    # user reads, so a click only takes the next one
+                    message = st.session_state.messages[message_index]
+                    prefetch_suggestion_variations(client, message_content, message)
+                    if st.button("🔄", key=f"regenerate_btn_{key_suffix}", help="Regenerer forslag"):
+                        message["suggestions"] = next_suggestion_variation(client, message_content, message)
+                        st.rerun()
 
 
             if suggestions:
@@ -213,6 +250,21 @@ def regenerate_suggestions(key_suffix):
         st.rerun()
 
 
+def display_cv_preview():
+    """Show a live HTML preview of the CV data.
+
+    CV_dict only changes on full script reruns, so the preview is rendered
+    on every run. Only the sections that changed are rendered again (see
+    render_html_preview).
+    """
+    cv_dict = st.session_state.get("CV_dict")
+    if not cv_dict:
+        return
+
+    # Rendered in an iframe so the CV styles don't leak into the app
+    components.html(render_html_preview(cv_dict), height=PREVIEW_HEIGHT, scrolling=True)
+
+
 def display_draft_preview():
     """Display draft message preview with editable text area if suggestions are selected."""
     # Check both old and new selection state keys for backwards compatibility
@@ -281,9 +333,25 @@ def combine_pills_with_user_input(user_message):
     return user_message
 
 
+def question_has_streamed(text):
+    """Check whether a streamed response contains a complete question line.
+
+    Args:
+        text: Response text streamed so far
+
+    Returns:
+        bool: True once a line ending with "?" has been fully streamed
+    """
+    return any(line.rstrip().rstrip("*_`").endswith("?") for line in text.split("\n")[:-1])
+
+
 def stream_message_with_suggestions(response_generator, client, key_suffix):
     """Stream assistant message and display suggestions in sidebar with real-time updates.
 
+    Suggestion generation is started in the background as soon as the question
+    line of the response has streamed, so it overlaps with the rest of the stream.
+    Only the question line is sent, never a partly streamed line.
+
     Args:
         response_generator: Generator yielding response chunks
         client: OpenAI client for generating suggestions
@@ -292,7 +360,24 @@ def stream_message_with_suggestions(response_generator, client, key_suffix):
     Returns:
         tuple: (response_text, suggestions_text)
     """
-    from src.llm_client import generate_adaptive_suggestions
+    from src.llm_client import generate_adaptive_suggestions, get_cached_suggestions, extract_question, executor
+
+    needs_suggestions = (
+        st.session_state.get("CV_mode", False)
+        and f"suggestions_{key_suffix}" not in st.session_state
+    )
+    # Read session state here, the worker thread must not touch it
+    user_data = st.session_state.get("CV_dict", {})
+    suggestions_future = None
+
+    def start_suggestions(question):
+        # Serve cached suggestions right away, only call the LLM on a miss
+        cached = get_cached_suggestions(question, user_data)
+        if cached is not None:
+            future = Future()
+            future.set_result(cached[0])
+            return future
+        return submit_traced(executor, generate_adaptive_suggestions, client, question, user_data, lookup=False)
 
     # Main message container
     message_container = st.empty()
@@ -303,7 +388,11 @@ def stream_message_with_suggestions(response_generator, client, key_suffix):
         response_text += chunk
         message_container.markdown(response_text)
 
-    # Now that response is complete, generate suggestions
+        if needs_suggestions and suggestions_future is None and question_has_streamed(response_text):
+            # The last line may still be streaming, only use complete ones
+            complete_text = response_text[:response_text.rfind("\n")]
+            suggestions_future = start_suggestions(extract_question(complete_text))
+
     suggestions = None
 
     # Display suggestions in sidebar
@@ -321,39 +410,27 @@ def stream_message_with_suggestions(response_generator, client, key_suffix):
 
         with col2:
             # Regenerate button for streaming message - small icon only
-            regenerating_stream_key = f"regenerating_stream_{key_suffix}"
             if st.session_state.get("CV_mode", False):
                 # Create small button with custom styling
                 col_btn1, col_btn2 = st.columns([0.1, 0.9])
                 with col_btn1:
-                    # Check if currently regenerating
-                    if st.session_state.get(regenerating_stream_key, False):
-                        # Show spinner instead of button
-                        with st.spinner(""):
-                            user_data = st.session_state.get("CV_dict", {})
-                            new_suggestions = generate_adaptive_suggestions(client, response_text, user_data, request_variation=True)
-                            # Clear the regenerating flag
-                            st.session_state[regenerating_stream_key] = False
-                            # Store suggestions for display
-                            st.session_state[f"suggestions_{key_suffix}"] = new_suggestions
-                            st.rerun()
-                    else:
-                        # Show button
-                        if st.button("🔄", key=f"regenerate_stream_btn_{key_suffix}", help="Regenerer forslag"):
-                            # Set regenerating flag and rerun
-                            st.session_state[regenerating_stream_key] = True
-                            st.rerun()
+                    if st.button("🔄", key=f"regenerate_stream_btn_{key_suffix}", help="Regenerer forslag"):
+                        state = st.session_state.setdefault(f"suggestion_pool_{key_suffix}", {})
+                        st.session_state[f"suggestions_{key_suffix}"] = next_suggestion_variation(client, response_text, state)
+                        st.rerun()
 
 
-            # Generate suggestions inside sidebar so spinner appears there (first time only)
-            if st.session_state.get("CV_mode", False) and not st.session_state.get(regenerating_stream_key, False):
+            # Collect suggestions inside sidebar so spinner appears there (first time only)
+            if st.session_state.get("CV_mode", False):
                 # Check if we have cached suggestions from regeneration
                 if f"suggestions_{key_suffix}" in st.session_state:
                     suggestions = st.session_state[f"suggestions_{key_suffix}"]
                 else:
-                    user_data = st.session_state.get("CV_dict", {})
                     with st.spinner(""):
-                        suggestions = generate_adaptive_suggestions(client, response_text, user_data)
+                        # No question line was detected while streaming, start from the full response
+                        if suggestions_future is None:
+                            suggestions_future = start_suggestions(extract_question(response_text))
+                        suggestions = suggestions_future.result()
 
             if suggestions:
                 suggestion_items = parse_examples_to_list(suggestions)
@@ -26,12 +26,19 @@ from src.config import SUGGESTIONS, MIN_TIME_BETWEEN_REQUESTS
 # Import LLM functions
 from src.llm_client import (
     get_openai_client,
+    get_client_pool_stats,
+    get_suggestion_cache_stats,
     build_question_prompt,
-    get_response
+    get_response,
+    executor
 )
 
 # Import data functions
-from src.cv_generator import json_to_cv_pdf, generate_word_docx
+from src.cv_generator import (
+    get_preamble_format,
+    get_compile_pool_stats,
+    get_artifact_cache_stats
+)
 from src.data_utils import extract_cv_from_pdf
 
 # Import metrics
@@ -39,8 +46,22 @@ from src.metrics import (
     log_event,
     log_error,
     track_first_user_input,
-    get_session_duration
+    get_session_duration,
+    get_timing_stats,
+    get_event_pipeline_stats,
+    get_metrics_upload_stats,
+    get_session_memory_usage,
+    save_session_metrics,
+    start_trace,
+    start_span,
+    record_turn_trace,
+    get_turn_traces,
+    get_trace_exporter_stats,
+    format_trace_waterfall,
+    get_token_usage_stats,
+    get_error_stats
 )
+from src.jobs import get_job_stats
 
 # Import UI and session helpers
 from src.ui_helpers import (
@@ -49,20 +70,41 @@ from src.ui_helpers import (
     display_draft_preview,
     stream_initial_message,
     combine_pills_with_user_input,
-    stream_message_with_suggestions
+    stream_message_with_suggestions,
+    display_cv_preview
 )
 from src.session_helpers import (
     initialize_app_session_state,
-    extract_and_save_json_data
+    start_json_extraction,
+    apply_json_extraction,
+    has_pending_json_extraction,
+    poll_json_extraction,
+    start_history_summary_update,
+    apply_history_summary,
+    reset_history_summary,
+    start_cv_generation,
+    has_pending_cv_generation,
+    poll_cv_generation,
+    apply_cv_generation,
+    collect_stale_message_state
 )
 
 # -----------------------------------------------------------------------------
 # App Initialization
 # -----------------------------------------------------------------------------
 
-# Initialize OpenAI client
+# Get the shared OpenAI client (created once per process, reused across reruns)
 client = get_openai_client(api_key=st.secrets["OPENAI_API_KEY"])
 
+
+@st.cache_resource
+def start_latex_format_build():
+    """Precompile the LaTeX preamble in the background, once per process."""
+    return executor.submit(get_preamble_format)
+
+
+start_latex_format_build()
+
 # Page configuration
 st.set_page_config(page_title="Ungt Steg AI Assistent", page_icon="✨")
 
@@ -84,6 +126,20 @@ DEBUG_MODE = st.query_params.get("debug", "false").lower() == "true"
 # Initialize session state
 initialize_app_session_state()
 
+# Merge background tasks that have finished since the last run
+apply_json_extraction()
+apply_history_summary()
+
+# Drop suggestion state of messages that are no longer shown with suggestions
+collect_stale_message_state()
+
+# The rerun after the last turn is over once the script is back here
+if st.session_state.get("rerun_span") is not None:
+    st.session_state.pop("rerun_span").end()
+
+# Root span of the chat turn handled in this run, if any
+turn_span = None
+
 
 # -----------------------------------------------------------------------------
 # Helper Functions
@@ -107,6 +163,9 @@ def clear_conversation():
     st.session_state.messages = []
     st.session_state.initial_question = None
     st.session_state.selected_suggestion = None
+    st.session_state.json_extraction = None
+    reset_history_summary()
+    st.session_state.cv_job_id = None
 
 
 def check_user_interaction():
@@ -187,6 +246,7 @@ if not user_message:
 uploaded_cv = st.file_uploader("Last opp eksisterende CV (pdf)", type=["pdf"])
 if uploaded_cv is not None and not st.session_state.get("CV_uploaded", False):
     st.session_state.messages = []
+    reset_history_summary()
 
 
 # -----------------------------------------------------------------------------
@@ -255,7 +315,7 @@ if uploaded_cv is not None and not st.session_state.get("CV_uploaded", False):
         st.session_state.messages.append({"role": "pdf_uploaded", "content": pdf_message_content})
 
         # Generate assistant response
-        with st.chat_message("assistant"):
+        with st.chat_message("assistant"), start_trace("pdf_turn") as turn_span:
             with st.spinner("Analyserer CV..."):
                 full_prompt = build_question_prompt(st.session_state.messages, pdf_message_content)
                 response_gen = get_response(client, full_prompt)
@@ -272,6 +332,7 @@ if uploaded_cv is not None and not st.session_state.get("CV_uploaded", False):
             # Mark that we just created a new message from PDF upload
             st.session_state.new_message_created = True
             st.session_state.message_from_pdf_upload = True
+        record_turn_trace(turn_span)
 
         st.session_state.CV_uploaded = True
     else:
@@ -333,7 +394,14 @@ if user_message is not None:
         st.text(user_message)
 
     # Display assistant response
-    with st.chat_message("assistant"):
+    with st.chat_message("assistant"), start_trace("turn", message_index=len(st.session_state.messages)) as turn_span:
+        # The prompt embeds CV_dict, so the previous turn's extraction must be merged first
+        with st.spinner("Researching..."):
+            apply_json_extraction(wait=True)
+
+        # Extract CV data from this answer while the assistant responds
+        start_json_extraction(client, user_message)
+
         # Rate limiting
         with st.spinner("Waiting..."):
             apply_rate_limiting()
@@ -343,7 +411,8 @@ if user_message is not None:
             with st.status("Computing prompt...") as status:
                 full_prompt = build_question_prompt(st.session_state.messages, user_message)
                 st.code(full_prompt)
-                status.update(label="Prompt computed")
+                st.json(st.session_state.prompt_tokens["chat"])
+                status.update(label=f"Prompt computed (~{st.session_state.prompt_tokens['chat']['total']} tokens)")
         else:
             with st.spinner("Researching..."):
                 full_prompt = build_question_prompt(st.session_state.messages, user_message)
@@ -364,6 +433,7 @@ if user_message is not None:
 
         # Mark that we just created a new message
         st.session_state.new_message_created = True
+    record_turn_trace(turn_span)
 
 
 # -----------------------------------------------------------------------------
@@ -371,16 +441,22 @@ if user_message is not None:
 # -----------------------------------------------------------------------------
 
 if st.session_state.get("new_message_created", False):
-    # Only extract JSON data if it's from user conversation, not PDF upload
-    if not st.session_state.get("message_from_pdf_upload", False):
-        extract_and_save_json_data(client)
+    # Fold messages that left the history window into the rolling summary
+    start_history_summary_update(client)
 
     # Reset the flags and trigger rerun to display with sidebar layout
     st.session_state.new_message_created = False
     st.session_state.message_from_pdf_upload = False
+    if turn_span is not None:
+        st.session_state.rerun_span = start_span("rerun", parent=turn_span)
     st.rerun()
 
 
+# Rerun once the background JSON extraction finishes so the sidebar is up to date
+if has_pending_json_extraction():
+    poll_json_extraction()
+
+
 # -----------------------------------------------------------------------------
 # Handle CV Generation
 # -----------------------------------------------------------------------------
@@ -389,34 +465,22 @@ if st.session_state.get("trigger_cv_generation", False):
     st.session_state.trigger_cv_generation = False
 
     if "CV_dict" in st.session_state:
-        with st.spinner("Genererer CV..."):
-            try:
-                # Generate PDF
-                json_to_cv_pdf(client, st.session_state.CV_dict)
-                with open("outputs/CV.pdf", "rb") as f:
-                    st.session_state["CV_pdf"] = f.read()
-
-                # Generate Word document
-                docx_buffer = generate_word_docx(client, st.session_state.CV_dict)
-                if docx_buffer:
-                    st.session_state["CV_docx"] = docx_buffer.read()
-
-                st.success("CV generert!")
-                st.session_state.generate_CV_button_clicked = True
-                log_event("cv_generated_success", {
-                    "message_count": len(st.session_state.get("messages", [])),
-                    "session_duration": get_session_duration()
-                })
-            except FileNotFoundError as e:
-                log_error("cv_generation_pdf_not_found", str(e))
-                st.error("PDF ikke funnet. Vennligst prøv å generere CVen på nytt.")
-            except Exception as e:
-                log_error("cv_generation_failed", str(e))
-                st.error(f"Feil under generering av CV: {str(e)}")
+        # Runs in the background; clicking again while it runs joins the same job
+        start_cv_generation(client)
     else:
         log_error("cv_generation_no_data", "CV_dict not in session state")
         st.error("Ingen CV data funnet. Vennligst samle inn data først.")
 
+# Show progress until the job is done, then store the PDF and Word document
+if has_pending_cv_generation() and not apply_cv_generation():
+    poll_cv_generation()
+
+
+# Live preview of the collected CV data, cheaper than generating the CV
+if st.session_state.get("CV_mode", False) and st.session_state.get("CV_dict") and not user_message:
+    with st.expander("Forhåndsvisning av CV"):
+        display_cv_preview()
+
 
 # -----------------------------------------------------------------------------
 # Show Download Buttons
@@ -455,3 +519,41 @@ if "CV_pdf" in st.session_state and st.session_state.get("generate_CV_button_cli
                     "session_duration": get_session_duration(),
                     "message_count": len(st.session_state.get("messages", []))
                 })
+
+
+# -----------------------------------------------------------------------------
+# Debug Info
+# -----------------------------------------------------------------------------
+
+if DEBUG_MODE:
+    with st.expander("Debug: turn traces"):
+        st.json(get_trace_exporter_stats())
+        for trace_id, spans in get_turn_traces():
+            st.caption(f"Trace {trace_id}")
+            st.code(format_trace_waterfall(spans), language=None)
+    with st.expander("Debug: token usage"):
+        st.json(get_token_usage_stats())
+    with st.expander("Debug: session memory"):
+        st.json(get_session_memory_usage())
+    with st.expander("Debug: OpenAI connection pool"):
+        st.json(get_client_pool_stats())
+    with st.expander("Debug: suggestion cache"):
+        st.json(get_suggestion_cache_stats())
+    with st.expander("Debug: LaTeX compile pool"):
+        st.json(get_compile_pool_stats())
+    with st.expander("Debug: errors (all sessions)"):
+        st.json(get_error_stats())
+    with st.expander("Debug: event pipeline"):
+        st.json(get_event_pipeline_stats())
+    with st.expander("Debug: metrics upload"):
+        st.json(get_metrics_upload_stats())
+    with st.expander("Debug: timings"):
+        st.json(get_timing_stats())
+    with st.expander("Debug: background jobs"):
+        st.json(get_job_stats())
+    with st.expander("Debug: generated CV cache"):
+        st.json(get_artifact_cache_stats())
+
+
+# Spool session metrics (uploaded in the background)
+save_session_metrics()
@@ -0,0 +1,117 @@
+"""Tests for applying extraction patch operations to CV data."""
+
+import copy
+
+import pytest
+
+from src.data_utils import PatchError, _apply_patch, apply_cv_patches, parse_cv_patches
+from src.schemas import CV_SCHEMA
+
+
+@pytest.fixture
+def cv():
+    return copy.deepcopy(CV_SCHEMA)
+
+
+def test_set_text_field(cv):
+    assert apply_cv_patches(cv, [{"op": "set", "path": "Personalia.Navn", "value": "Kari"}]) == []
+    assert cv["Personalia"]["Navn"] == "Kari"
+
+
+def test_append_reuses_blank_item_then_set_last(cv):
+    errors = apply_cv_patches(cv, [
+        {"op": "append", "path": "Utdanning", "value": ""},
+        {"op": "set", "path": "Utdanning.-1.Skole", "value": "UiO"},
+    ])
+    assert errors == []
+    assert len(cv["Utdanning"]) == 1
+    assert cv["Utdanning"][0]["Skole"] == "UiO"
+
+
+def test_append_adds_item_after_filled_one(cv):
+    cv["Utdanning"][0]["Skole"] = "UiO"
+    apply_cv_patches(cv, [
+        {"op": "append", "path": "Utdanning", "value": ""},
+        {"op": "set", "path": "Utdanning.-1.Skole", "value": "NTNU"},
+    ])
+    assert [item["Skole"] for item in cv["Utdanning"]] == ["UiO", "NTNU"]
+
+
+@pytest.mark.parametrize("value", [
+    {"Tittel": "Utvikler", "Firma": "Acme"},
+    '{"Tittel": "Utvikler", "Firma": "Acme"}',
+])
+def test_append_with_object_value(cv, value):
+    assert apply_cv_patches(cv, [{"op": "append", "path": "Arbeidserfaring.Stillinger", "value": value}]) == []
+    item = cv["Arbeidserfaring"]["Stillinger"][-1]
+    assert item["Tittel"] == "Utvikler"
+    assert item["Firma"] == "Acme"
+    assert item["Periode"] == ""
+
+
+@pytest.mark.parametrize("value", ["Utvikler", ["Utvikler"], {"Ukjent": "x"}])
+def test_append_rejects_bad_object_value(cv, value):
+    before = copy.deepcopy(cv)
+    errors = apply_cv_patches(cv, [{"op": "append", "path": "Arbeidserfaring.Stillinger", "value": value}])
+    assert len(errors) == 1
+    assert cv == before
+
+
+@pytest.mark.parametrize("path", ["Personalia.Navn", "Ferdigheter.Sertifikater.0"])
+@pytest.mark.parametrize("value", [{"Fornavn": "Kari"}, ["Kari"]])
+def test_set_rejects_non_scalar_value(cv, path, value):
+    cv["Ferdigheter"]["Sertifikater"] = ["Førerkort B"]
+    before = copy.deepcopy(cv)
+    with pytest.raises(PatchError):
+        _apply_patch(cv, {"op": "set", "path": path, "value": value})
+    assert len(apply_cv_patches(cv, [{"op": "set", "path": path, "value": value}])) == 1
+    assert cv == before
+
+
+def test_set_converts_numbers(cv):
+    apply_cv_patches(cv, [{"op": "set", "path": "Utdanning.-1.Trinn/Ferdig_år", "value": 2020}])
+    assert cv["Utdanning"][-1]["Trinn/Ferdig_år"] == "2020"
+
+
+def test_append_string_list_skips_duplicates(cv):
+    apply_cv_patches(cv, [
+        {"op": "append", "path": "Ferdigheter.Sertifikater", "value": "Førerkort B"},
+        {"op": "append", "path": "Ferdigheter.Sertifikater", "value": "Førerkort B"},
+    ])
+    assert cv["Ferdigheter"]["Sertifikater"] == ["Førerkort B"]
+
+
+def test_remove_list_item_and_clear_field(cv):
+    cv["Ferdigheter"]["Sertifikater"] = ["A", "B"]
+    cv["Personalia"]["Navn"] = "Kari"
+    errors = apply_cv_patches(cv, [
+        {"op": "remove", "path": "Ferdigheter.Sertifikater.0"},
+        {"op": "remove", "path": "Personalia.Navn"},
+    ])
+    assert errors == []
+    assert cv["Ferdigheter"]["Sertifikater"] == ["B"]
+    assert cv["Personalia"]["Navn"] == ""
+
+
+@pytest.mark.parametrize("patch", [
+    {"op": "set", "path": "Personalia.Ukjent", "value": "x"},
+    {"op": "set", "path": "Utdanning.5.Skole", "value": "x"},
+    {"op": "set", "path": "Utdanning.x.Skole", "value": "x"},
+    {"op": "set", "path": "Personalia", "value": "x"},
+    {"op": "append", "path": "Personalia.Navn", "value": "x"},
+    {"op": "move", "path": "Personalia.Navn", "value": "x"},
+])
+def test_bad_patch_is_skipped(cv, patch):
+    before = copy.deepcopy(cv)
+    errors = apply_cv_patches(cv, [patch, {"op": "set", "path": "Personalia.Navn", "value": "Kari"}])
+    assert len(errors) == 1
+    before["Personalia"]["Navn"] = "Kari"
+    assert cv == before
+
+
+def test_parse_patches_accepts_wrapped_bare_and_truncated():
+    patch = {"op": "set", "path": "Personalia.Navn", "value": "Kari"}
+    assert parse_cv_patches('{"patches": [{"op": "set", "path": "Personalia.Navn", "value": "Kari"}]}') == [patch]
+    assert parse_cv_patches('[{"op": "set", "path": "Personalia.Navn", "value": "Kari"}, 1]') == [patch]
+    assert parse_cv_patches('{"patches": [{"op": "set", "path": "Personalia.Navn", "value": "Kari"}, {"op": "se') == [patch]
+    assert parse_cv_patches("not json") == []
@@ -0,0 +1,59 @@
+"""Tests for merging extracted CV data into existing CV data."""
+
+from src.data_utils import deep_update
+
+
+def test_blank_values_do_not_overwrite():
+    original = {"Personalia": {"Navn": "Kari", "Epost": ""}}
+    deep_update(original, {"Personalia": {"Navn": "", "Epost": "kari@example.com"}})
+    assert original == {"Personalia": {"Navn": "Kari", "Epost": "kari@example.com"}}
+
+
+def test_entries_merge_by_identity_keys():
+    original = {"Utdanning": [
+        {"Skole": "UiO", "Grad": "Bachelor", "Trinn/Ferdig_år": ""},
+        {"Skole": "NTNU", "Grad": "Master", "Trinn/Ferdig_år": ""},
+    ]}
+    deep_update(original, {"Utdanning": [{"Skole": "uio ", "Grad": "bachelor", "Trinn/Ferdig_år": "2020"}]})
+    assert len(original["Utdanning"]) == 2
+    assert original["Utdanning"][0]["Trinn/Ferdig_år"] == "2020"
+    assert original["Utdanning"][1]["Trinn/Ferdig_år"] == ""
+
+
+def test_new_identity_is_appended():
+    original = {"Utdanning": [{"Skole": "UiO", "Grad": "Bachelor"}]}
+    deep_update(original, {"Utdanning": [{"Skole": "UiO", "Grad": "Master"}]})
+    assert [item["Grad"] for item in original["Utdanning"]] == ["Bachelor", "Master"]
+
+
+def test_incomplete_entry_is_continued_when_related():
+    original = {"Arbeidserfaring": {"Stillinger": [{"Tittel": "Dev"}]}}
+    deep_update(original, {"Arbeidserfaring": {"Stillinger": [{"Tittel": "Dev", "Firma": "B"}]}})
+    assert original["Arbeidserfaring"]["Stillinger"] == [{"Tittel": "Dev", "Firma": "B"}]
+
+
+def test_unrelated_entry_is_not_merged_into_incomplete_entry():
+    original = {"Arbeidserfaring": {"Stillinger": [{"Tittel": "Dev"}]}}
+    deep_update(original, {"Arbeidserfaring": {"Stillinger": [{"Firma": "B", "Periode": "2020"}]}})
+    assert original["Arbeidserfaring"]["Stillinger"] == [
+        {"Tittel": "Dev"},
+        {"Firma": "B", "Periode": "2020"},
+    ]
+
+
+def test_conflicting_entry_is_not_merged():
+    original = {"Arbeidserfaring": {"Stillinger": [{"Tittel": "Dev", "Periode": "2019"}]}}
+    deep_update(original, {"Arbeidserfaring": {"Stillinger": [{"Tittel": "Dev", "Periode": "2021"}]}})
+    assert len(original["Arbeidserfaring"]["Stillinger"]) == 2
+
+
+def test_complete_entry_is_not_continued():
+    original = {"Arbeidserfaring": {"Stillinger": [{"Tittel": "Dev", "Firma": "A"}]}}
+    deep_update(original, {"Arbeidserfaring": {"Stillinger": [{"Tittel": "Dev", "Periode": "2020"}]}})
+    assert len(original["Arbeidserfaring"]["Stillinger"]) == 2
+
+
+def test_duplicates_are_skipped():
+    original = {"Ferdigheter": {"Sertifikater": ["Førerkort B"]}, "Referanser": [{"Navn": "Ola"}]}
+    deep_update(original, {"Ferdigheter": {"Sertifikater": ["Førerkort B", "Truck"]}, "Referanser": [{"Navn": "Ola"}]})
+    assert original == {"Ferdigheter": {"Sertifikater": ["Førerkort B", "Truck"]}, "Referanser": [{"Navn": "Ola"}]}
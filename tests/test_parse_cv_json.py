@@ -0,0 +1,52 @@
+"""Tests for parsing, repairing and validating extracted CV JSON."""
+
+import json
+
+from src.data_utils import parse_cv_json, repair_truncated_json, validate_cv_data
+
+
+def test_repair_complete_json_is_unchanged():
+    text = '{"Personalia": {"Navn": "Kari"}}'
+    assert repair_truncated_json(text) == text
+
+
+def test_repair_drops_cut_off_string():
+    text = '{"Personalia": {"Navn": "Kari", "Epost": "kari@exa'
+    assert json.loads(repair_truncated_json(text)) == {"Personalia": {"Navn": "Kari"}}
+
+
+def test_repair_drops_dangling_key():
+    text = '{"Personalia": {"Navn": "Kari", "Epost"'
+    assert json.loads(repair_truncated_json(text)) == {"Personalia": {"Navn": "Kari"}}
+
+
+def test_repair_closes_open_lists():
+    text = '{"Ferdigheter": {"Sertifikater": ["Førerkort B", "Truck'
+    assert json.loads(repair_truncated_json(text)) == {"Ferdigheter": {"Sertifikater": ["Førerkort B"]}}
+
+
+def test_repair_keeps_escaped_quotes():
+    text = '{"Personalia": {"Navn": "Kari \\"K\\" Nordmann", "Adresse": "Oslo'
+    assert json.loads(repair_truncated_json(text)) == {"Personalia": {"Navn": 'Kari "K" Nordmann'}}
+
+
+def test_parse_repairs_truncated_output():
+    text = '{"Personalia": {"Navn": "Kari"}, "Utdanning": [{"Skole": "UiO", "Grad": "Bach'
+    assert parse_cv_json(text) == {"Personalia": {"Navn": "Kari"}, "Utdanning": [{"Skole": "UiO"}]}
+
+
+def test_parse_strips_code_fences():
+    text = '```json\n{"Personalia": {"Navn": "Kari"}}\n```'
+    assert parse_cv_json(text) == {"Personalia": {"Navn": "Kari"}}
+
+
+def test_parse_returns_none_for_garbage():
+    assert parse_cv_json("not json") is None
+
+
+def test_validate_drops_nulls_and_unknown_fields():
+    cleaned, errors = validate_cv_data(
+        {"Personalia": {"Navn": "Kari", "Epost": None, "Ukjent": "x"}, "Referanser": None}
+    )
+    assert cleaned == {"Personalia": {"Navn": "Kari"}}
+    assert len(errors) == 1
@@ -0,0 +1,37 @@
+"""Tests for the session metrics ring buffer."""
+
+import threading
+
+from src.metrics import RingBuffer
+
+
+def test_keeps_most_recent_items():
+    buffer = RingBuffer(3)
+    for i in range(5):
+        buffer.append(i)
+    assert buffer.snapshot() == [2, 3, 4]
+    assert (buffer.total, buffer.dropped, len(buffer)) == (5, 2, 3)
+
+
+def test_reading_while_other_threads_append():
+    buffer = RingBuffer(1000)
+
+    def writer():
+        for i in range(20000):
+            buffer.append(i)
+
+    threads = [threading.Thread(target=writer) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    reader_errors = []
+    while any(thread.is_alive() for thread in threads):
+        try:
+            sum(1 for _ in buffer)
+        except RuntimeError as e:  # "deque mutated during iteration"
+            reader_errors.append(e)
+    for thread in threads:
+        thread.join()
+
+    assert reader_errors == []
+    assert buffer.total == 80000
+    assert len(buffer) == 1000
@@ -0,0 +1,81 @@
+"""Tests for the suggestion cache key and lookups."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from src import llm_client
+from src.llm_client import extract_question, generate_adaptive_suggestions, suggestion_cache_key
+
+
+class FakeClient:
+    """OpenAI client stand-in that counts completion calls."""
+
+    def __init__(self, content):
+        self.calls = 0
+        self.content = content
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content=self.content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    llm_client.suggestion_cache.clear()
+    yield
+    llm_client.suggestion_cache.clear()
+
+
+def profile(name, birth_date, address, school):
+    return {
+        "Personalia": {"Navn": name, "Fødselsdato": birth_date, "Adresse": address, "Epost": "", "Telefonnummer": ""},
+        "Utdanning": [{"Skole": school, "Grad": "Bachelor", "Trinn/Ferdig_år": "", "Ytterligere_informasjon": ""}],
+    }
+
+
+def test_extract_question_takes_question_line():
+    assert extract_question("Takk, Kari!\n**Hvor har du jobbet?**\nSkriv gjerne") == "**Hvor har du jobbet?**"
+    assert extract_question("Takk, Kari!") == "Takk, Kari!"
+
+
+def test_key_ignores_greeting_and_identity_fields():
+    kari = profile("Kari Nordmann", "01.01.2000", "Storgata 1, Oslo", "UiO")
+    ola = profile("Ola Hansen", "02.02.1999", "Bygata 2, Bergen", "UiO")
+    assert suggestion_cache_key("Takk, Kari!\nHvor har du jobbet?", kari) == suggestion_cache_key(
+        "Supert, Ola.\nHvor har du jobbet?\n", ola
+    )
+
+
+def test_key_differs_for_relevant_fields():
+    uio = profile("Kari", "", "", "UiO")
+    ntnu = profile("Kari", "", "", "NTNU")
+    assert suggestion_cache_key("Hvor har du jobbet?", uio) != suggestion_cache_key("Hvor har du jobbet?", ntnu)
+
+
+def test_cache_hit_across_profiles():
+    client = FakeClient("- Butikkmedarbeider, Coop Extra (2022-2023)")
+    kari = profile("Kari Nordmann", "01.01.2000", "Storgata 1, Oslo", "UiO")
+    ola = profile("Ola Hansen", "02.02.1999", "Bygata 2, Bergen", "UiO")
+
+    hits = llm_client.get_suggestion_cache_stats()["hits"]
+    first = generate_adaptive_suggestions(client, "Takk, Kari!\nHvor har du jobbet?", kari)
+    second = generate_adaptive_suggestions(client, "Supert, Ola.\nHvor har du jobbet?", ola)
+
+    assert first == second == "- Butikkmedarbeider, Coop Extra (2022-2023)"
+    assert client.calls == 1
+    assert llm_client.get_suggestion_cache_stats()["hits"] == hits + 1
+
+
+def test_identity_fields_are_not_sent():
+    client = FakeClient("NONE")
+    prompts = []
+    create = client.create
+    client.chat.completions.create = lambda **kwargs: prompts.append(kwargs["messages"][-1]["content"]) or create(**kwargs)
+
+    generate_adaptive_suggestions(client, "Hvor har du jobbet?", profile("Kari Nordmann", "01.01.2000", "Storgata 1", "UiO"))
+
+    assert "Kari Nordmann" not in prompts[0]
+    assert "UiO" in prompts[0]